@@ -1,29 +1,158 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from app.config import settings
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer
+from fastapi.concurrency import run_in_threadpool
+from app.utils.metrics import request_metrics
+from collections import OrderedDict
+import threading
+import hashlib
 import logging
+import time
+import re
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+class CachingRequest:
+    """
+    google-auth transport that reuses one pooled HTTP session and keeps
+    GET responses (Google's public certs) for as long as their
+    Cache-Control max-age allows, instead of re-fetching them per token.
+    The underlying requests transport is only built on first use.
+    """
+
+    def __init__(self, pool_size: int = 10):
+        self.pool_size = pool_size
+        self._transport = None
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def transport(self):
+        """The wrapped google.auth.transport.requests.Request, created on first use"""
+        with self._lock:
+            if self._transport is None:
+                import requests as http_requests
+                from google.auth.transport import requests
+
+                session = http_requests.Session()
+                adapter = http_requests.adapters.HTTPAdapter(
+                    pool_connections=self.pool_size, pool_maxsize=self.pool_size
+                )
+                session.mount("https://", adapter)
+                self._transport = requests.Request(session=session)
+            return self._transport
+
+    @staticmethod
+    def _max_age(headers) -> int:
+        cache_control = (headers.get("cache-control") or "").lower()
+        if "no-store" in cache_control or "no-cache" in cache_control:
+            return 0
+        match = MAX_AGE_PATTERN.search(cache_control)
+        if not match:
+            return 0
+        try:
+            age = int(headers.get("age") or 0)
+        except ValueError:
+            age = 0
+        return max(int(match.group(1)) - age, 0)
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        transport = self.transport()
+        if method != "GET" or body is not None:
+            return transport(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        with self._lock:
+            cached = self._responses.get(url)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+        response = transport(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+        max_age = self._max_age(response.headers) if response.status == 200 else 0
+        if max_age:
+            with self._lock:
+                self._responses[url] = (time.monotonic() + max_age, response)
+        return response
+
+class VerifiedTokenCache:
+    """
+    LRU cache of verified ID token claims, keyed by a hash of the token so
+    raw credentials are never held in memory. Entries expire at the
+    token's own `exp` claim.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, idinfo = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return idinfo
+
+    def put(self, token: str, idinfo: dict):
+        expires_at = idinfo.get("exp")
+        if not expires_at or self.max_size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), idinfo)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
 class GoogleAuth:
     def __init__(self):
         self.client_id = settings.GOOGLE_CLIENT_ID
         self.admin_emails = settings.ADMIN_EMAIL_LIST  # Now a list
+        self.request = CachingRequest()
+        self.token_cache = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+    def warm_up(self):
+        """Import google-auth and build the HTTP transport before the first login"""
+        from google.oauth2 import id_token  # noqa: F401
+
+        self.request.transport()
+
+    def verify_token(self, token: str) -> dict:
+        """
+        Verify a Google ID token, skipping signature checks for tokens
+        already verified and not yet expired
+        """
+        idinfo = self.token_cache.get(token)
+        if idinfo is None:
+            from google.oauth2 import id_token
+
+            idinfo = id_token.verify_oauth2_token(token, self.request, self.client_id)
+            self.token_cache.put(token, idinfo)
+        return idinfo
 
     def verify_admin_token(self, token: str):
         """
         Verify Google ID token and check if user is one of the authorized admins
         """
         try:
-            # Verify the token with Google
-            idinfo = id_token.verify_oauth2_token(
-                token,
-                requests.Request(),
-                self.client_id
-            )
+            # Verify the token with Google (cached until the token expires)
+            idinfo = self.verify_token(token)
 
             # Get user email from verified token
             user_email = idinfo.get('email', '').lower().strip()
@@ -71,7 +200,9 @@ async def get_current_admin(credentials = Depends(security)):
     """
     try:
         token = credentials.credentials
-        admin_user = google_auth.verify_admin_token(token)
+        # Verification may fetch Google's certs; keep it off the event loop
+        with request_metrics.span("auth", "verify_admin_token"):
+            admin_user = await run_in_threadpool(google_auth.verify_admin_token, token)
         logger.info(f"Admin authenticated successfully: {admin_user['email']}")
         return admin_user
         
@@ -0,0 +1,59 @@
+from app.config import settings
+from app.auth.google_auth import get_current_admin
+from fastapi import HTTPException, Depends, Header, Request, status
+from fastapi.security import HTTPBearer
+from typing import Optional
+import hmac
+import logging
+
+logger = logging.getLogger(__name__)
+optional_security = HTTPBearer(auto_error=False)
+
+async def get_optional_backend(x_service_key: Optional[str] = Header(None),
+                               credentials = Depends(optional_security)):
+    """
+    Dependency identifying server-side callers: the payment webhook or
+    checkout backend by its X-Service-Key, or an admin by their Google
+    token. Returns None for an anonymous (customer) request.
+    """
+    if x_service_key is not None:
+        key = settings.INVENTORY_SERVICE_KEY
+        if not key or not hmac.compare_digest(x_service_key.encode("utf-8"), key.encode("utf-8")):
+            logger.warning("Rejected request with an invalid service key")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid service key"
+            )
+        return {"service": "checkout"}
+    if credentials is not None:
+        return await get_current_admin(credentials)
+    return None
+
+def client_address(request: Request) -> str:
+    """
+    The customer's address. Behind trusted proxies it is the last
+    X-Forwarded-For entry they did not add themselves; earlier entries are
+    whatever the client chose to send.
+    """
+    address = request.client.host if request.client else ""
+    if address not in settings.TRUSTED_PROXIES:
+        return address
+    forwarded = [
+        entry.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for entry in header.split(",") if entry.strip()
+    ]
+    for entry in reversed(forwarded):
+        if entry not in settings.TRUSTED_PROXIES:
+            return entry
+    return forwarded[0] if forwarded else address
+
+async def get_current_backend(caller = Depends(get_optional_backend)):
+    """Dependency for calls only the payment webhook, checkout backend or an admin may make"""
+    if caller is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Service key or admin credentials required",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return caller
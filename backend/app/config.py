@@ -12,9 +12,89 @@ class Settings:
     # Firebase
     FIREBASE_PROJECT_ID: str = os.getenv("FIREBASE_PROJECT_ID")
     FIREBASE_CREDENTIALS_PATH: str = os.getenv("FIREBASE_CREDENTIALS_PATH")
+    # Threads available for blocking Firestore calls made from async routes
+    FIRESTORE_MAX_WORKERS: int = int(os.getenv("FIRESTORE_MAX_WORKERS", 8))
+    
+    # Storage - "firestore", or "memory"/"sqlite" to run the API offline
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "firestore").lower()
+    SQLITE_DATABASE_PATH: str = os.getenv("SQLITE_DATABASE_PATH", "boltfit.db")
     
     # Google Auth - ✅ These must be set
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID")
+    # Verified ID tokens kept in memory so repeat admin calls skip RSA verification
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 256))
+
+    # Catalog cache - disable when running several workers to always query Firestore
+    CATALOG_CACHE_ENABLED: bool = os.getenv("CATALOG_CACHE_ENABLED", "True").lower() == "true"
+    # Catalog cache - seconds before the in-memory product list is reloaded
+    CATALOG_CACHE_TTL_SECONDS: float = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", 60))
+    # Catalog cache - keep a live replica via a Firestore listener instead of TTL reloads
+    CATALOG_REALTIME_SYNC: bool = os.getenv("CATALOG_REALTIME_SYNC", "False").lower() == "true"
+    # Catalog snapshot - local file the catalog is saved to and served from after a cold start
+    CATALOG_SNAPSHOT_PATH: str = os.getenv("CATALOG_SNAPSHOT_PATH", "catalog_snapshot.jsonl")
+    CATALOG_SNAPSHOT_INTERVAL_SECONDS: float = float(os.getenv("CATALOG_SNAPSHOT_INTERVAL_SECONDS", 300))
+    # Shared catalog - with several workers, one loads the catalog and shares it through
+    # memory-mapped files at this path (e.g. /dev/shm/boltfit-catalog); empty disables it
+    SHARED_CATALOG_PATH: str = os.getenv("SHARED_CATALOG_PATH", "")
+    SHARED_CATALOG_INTERVAL_SECONDS: float = float(os.getenv("SHARED_CATALOG_INTERVAL_SECONDS", 1))
+    
+    # HTTP caching - Cache-Control sent with public product endpoints
+    PRODUCT_LIST_CACHE_CONTROL: str = os.getenv(
+        "PRODUCT_LIST_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300"
+    )
+    PRODUCT_DETAIL_CACHE_CONTROL: str = os.getenv(
+        "PRODUCT_DETAIL_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300"
+    )
+    CATEGORIES_CACHE_CONTROL: str = os.getenv(
+        "CATEGORIES_CACHE_CONTROL", "public, max-age=3600, stale-while-revalidate=86400"
+    )
+    
+    # Compression - responses smaller than this many bytes are sent as-is
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+    GZIP_COMPRESSION_LEVEL: int = int(os.getenv("GZIP_COMPRESSION_LEVEL", 6))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", 5))
+    # Compressed list pages kept in memory, keyed by ETag and encoding
+    PRECOMPRESSED_CACHE_SIZE: int = int(os.getenv("PRECOMPRESSED_CACHE_SIZE", 256))
+    
+    # Metrics - add a Server-Timing header (storage/auth/serialization time) to every response
+    SERVER_TIMING_HEADER: bool = os.getenv("SERVER_TIMING_HEADER", "True").lower() == "true"
+    
+    # Inventory - shard documents per SKU, so concurrent checkouts write to different documents
+    INVENTORY_SHARDS: int = int(os.getenv("INVENTORY_SHARDS", 4))
+    # Inventory - seconds a reservation holds stock before it is released unless committed
+    INVENTORY_RESERVATION_TTL_SECONDS: float = float(os.getenv("INVENTORY_RESERVATION_TTL_SECONDS", 600))
+    INVENTORY_EXPIRY_INTERVAL_SECONDS: float = float(os.getenv("INVENTORY_EXPIRY_INTERVAL_SECONDS", 30))
+    # Inventory - longest hold a client may ask for, units per reservation and open reservations per client
+    INVENTORY_MAX_TTL_SECONDS: float = float(os.getenv("INVENTORY_MAX_TTL_SECONDS", 900))
+    INVENTORY_MAX_QUANTITY: int = int(os.getenv("INVENTORY_MAX_QUANTITY", 20))
+    INVENTORY_MAX_RESERVATIONS_PER_CLIENT: int = int(os.getenv("INVENTORY_MAX_RESERVATIONS_PER_CLIENT", 3))
+    # Inventory - shared secret the payment webhook / checkout backend sends as X-Service-Key to
+    # commit reservations, and the metrics scraper to read /metrics; empty means admins only
+    INVENTORY_SERVICE_KEY: str = os.getenv("INVENTORY_SERVICE_KEY", "")
+    # Proxies (e.g. the load balancer) whose X-Forwarded-For is trusted to name the customer's
+    # address for the per-client limits; empty uses the connecting address
+    TRUSTED_PROXIES: list = [
+        address.strip()
+        for address in os.getenv("TRUSTED_PROXIES", "").split(",")
+        if address.strip()
+    ]
+    
+    # Image proxy - resized copies kept on local disk, least recently used evicted past the limit,
+    # which holds for the whole directory when several workers share it
+    IMAGE_CACHE_DIR: str = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+    IMAGE_CACHE_MAX_BYTES: int = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    # Image proxy - hosts originals may be fetched from (ImgBB, Firebase Storage)
+    IMAGE_ALLOWED_HOSTS: list = [
+        host.strip().lower()
+        for host in os.getenv("IMAGE_ALLOWED_HOSTS", "i.ibb.co,firebasestorage.googleapis.com").split(",")
+        if host.strip()
+    ]
+    # Image proxy - serve originals from this directory instead of fetching them (local development)
+    IMAGE_ORIGIN_DIRECTORY: str = os.getenv("IMAGE_ORIGIN_DIRECTORY", "")
+    # Image proxy - prefix for variant URLs in product responses; empty gives relative URLs
+    IMAGE_PROXY_BASE_URL: str = os.getenv("IMAGE_PROXY_BASE_URL", "").rstrip("/")
+    IMAGE_QUALITY: int = int(os.getenv("IMAGE_QUALITY", 80))
+    IMAGES_CACHE_CONTROL: str = os.getenv("IMAGES_CACHE_CONTROL", "public, max-age=31536000, immutable")
     
     # Admin - ✅ This must match your Google account
     # Admin emails - ✅ List of authorized admin emails
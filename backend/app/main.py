@@ -1,19 +1,75 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 from app.config import settings
-from app.routes import auth, products
+from app.routes import auth, products, inventory, images
+from app.middleware.compression import CompressionMiddleware, compression_stats
+from app.middleware.metrics import MetricsMiddleware
+from app.utils.metrics import request_metrics
+from app.services.catalog_cache import get_catalog_cache
+from app.services.inventory import get_inventory
+from app.services.storage import get_storage
+from app.auth.google_auth import google_auth
+from app.auth.service_auth import get_current_backend
+import asyncio
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def resolve_services(app: FastAPI) -> tuple:
+    """
+    The (storage, catalog cache, inventory) routes use, honouring a
+    get_storage override, for the work done outside requests
+    """
+    storage = app.dependency_overrides.get(get_storage, get_storage)()
+    return storage, get_catalog_cache(storage), get_inventory(storage)
+
+async def warm_up(storage, catalog_cache):
+    """Initialise storage and google-auth in the background, then start catalog sync"""
+    try:
+        await storage.warm_up()
+        await asyncio.to_thread(google_auth.warm_up)
+    except Exception as e:
+        # Readiness keeps reporting the error; requests retry initialisation lazily
+        logger.error(f"Warm-up failed: {e}")
+        return
+    # Keep the product catalog as a live in-memory replica when enabled
+    if settings.CATALOG_REALTIME_SYNC:
+        catalog_cache.start_realtime_sync()
+    elif catalog_cache.enabled and catalog_cache.shared is None:
+        # With a shared catalog the sharing task loads it, in the leader only
+        catalog_cache.refresh_in_background()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start serving immediately: the catalog comes from the local snapshot
+    and the Firebase/Google clients are set up by a background warm-up
+    rather than at import time
+    """
+    storage, catalog_cache, inventory_service = resolve_services(app)
+    await asyncio.to_thread(catalog_cache.load_snapshot)
+    app.state.warm_up = asyncio.get_running_loop().create_task(warm_up(storage, catalog_cache))
+    catalog_cache.start_snapshots()
+    catalog_cache.start_sharing()
+    inventory_service.start_expiry()
+    yield
+    await inventory_service.stop_expiry()
+    app.state.warm_up.cancel()
+    catalog_cache.stop_realtime_sync()
+    await catalog_cache.stop_snapshots()
+    await catalog_cache.stop_sharing()
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     description="Backend API for BOLT FIT E-commerce Application",
     version="1.0.0",
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
 # CORS Configuration
@@ -31,9 +87,27 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Response compression (after CORS, so it sees the final body)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_COMPRESSION_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
+    stats=compression_stats
+)
+
+# Request metrics (outermost, so latency and sizes cover everything above)
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=request_metrics,
+    server_timing_header=settings.SERVER_TIMING_HEADER
+)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(products.router, prefix="/api/v1")
+app.include_router(inventory.router, prefix="/api/v1")
+app.include_router(images.router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -46,14 +120,50 @@ async def root():
     }
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up and serving requests"""
     return {
         "status": "healthy",
         "service": settings.APP_NAME,
         "image_storage": "Firebase Storage"
     }
 
+@app.get("/health/ready")
+async def readiness_check(storage = Depends(get_storage), catalog_cache = Depends(get_catalog_cache)):
+    """
+    Readiness: storage is connected and the catalog can be served. The
+    real-time listener's state is reported but does not gate readiness;
+    while it is down the catalog falls back to TTL reloads. Errors are
+    logged, not returned; listener errors are in the admin cache stats.
+    """
+    checks = {
+        "storage": storage.service.is_initialized,
+        "catalog": not catalog_cache.enabled or catalog_cache.is_loaded(),
+    }
+    ready = all(checks.values())
+    body = {"status": "ready" if ready else "starting", "checks": checks,
+            "realtime": catalog_cache.watch_state()}
+    if storage.service.init_error:
+        # Kept out of the unauthenticated response: it is raw Firebase error text
+        logger.warning(f"Not ready, storage failed to initialize: {storage.service.init_error}")
+    return JSONResponse(
+        body, status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+@app.get("/metrics")
+async def get_metrics(caller = Depends(get_current_backend)):
+    """
+    Request latency, response size, in-flight and span metrics in Prometheus
+    text format - SERVICE KEY OR ADMIN ONLY (scrape with an X-Service-Key header)
+    """
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/compression")
+async def get_compression_metrics(caller = Depends(get_current_backend)):
+    """Per-endpoint response sizes before and after compression - SERVICE KEY OR ADMIN ONLY"""
+    return compression_stats.snapshot()
+
 @app.options("/{full_path:path}")
 async def options_handler(full_path: str):
     """Handle OPTIONS requests for CORS preflight"""
@@ -0,0 +1,258 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from app.config import settings
+from app.utils.http_cache import weak_etag
+from collections import OrderedDict
+import threading
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick brotli or gzip from an Accept-Encoding header, or None"""
+    accepted = {}
+    for item in (accept_encoding or "").lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    """Compress a complete body in one go"""
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+def is_compressible(content_type: str) -> bool:
+    content_type = (content_type or "").lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+class CompressionStats:
+    """Per-endpoint counters for how many bytes compression saved"""
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, original_size: int, sent_size: int, precompressed: bool = False):
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {
+                "responses": 0,
+                "compressed": 0,
+                "precompressed": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+            })
+            entry["responses"] += 1
+            if sent_size < original_size:
+                entry["compressed"] += 1
+            if precompressed:
+                entry["precompressed"] += 1
+            entry["bytes_in"] += original_size
+            entry["bytes_out"] += sent_size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {**entry, "bytes_saved": entry["bytes_in"] - entry["bytes_out"]}
+                for endpoint, entry in self._endpoints.items()
+            }
+
+class PrecompressedCache:
+    """
+    Bounded LRU of already-compressed response bodies keyed by
+    (ETag, encoding), so hot list pages are compressed once and then
+    served as stored bytes
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, encoding: str):
+        with self._lock:
+            entry = self._entries.get((etag, encoding))
+            if entry is not None:
+                self._entries.move_to_end((etag, encoding))
+            return entry
+
+    def put(self, etag: str, encoding: str, original_size: int, body: bytes):
+        with self._lock:
+            self._entries[(etag, encoding)] = (original_size, body)
+            self._entries.move_to_end((etag, encoding))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+def precompressed_response(request, endpoint: str, etag: str, headers: dict, build_body) -> Response:
+    """
+    JSON response for a cacheable payload identified by `etag`, served from
+    the precompressed cache when possible. `build_body` is only called on a
+    cache miss, so repeat requests skip both serialization and compression.
+    Every encoding shares one weak ETag and varies on Accept-Encoding.
+    """
+    headers = {**headers, "ETag": weak_etag(headers["ETag"]), "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        cached = precompressed_cache.get(etag, encoding)
+        if cached is not None:
+            original_size, body = cached
+            compression_stats.record(endpoint, original_size, len(body), precompressed=True)
+            return Response(
+                content=body,
+                media_type="application/json",
+                headers={**headers, "Content-Encoding": encoding}
+            )
+
+    body = build_body()
+    if encoding is None or len(body) < settings.COMPRESSION_MINIMUM_SIZE:
+        # Small or uncompressed bodies are left to the middleware
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    compressed = compress(body, encoding, settings.GZIP_COMPRESSION_LEVEL, settings.BROTLI_QUALITY)
+    precompressed_cache.put(etag, encoding, len(body), compressed)
+    compression_stats.record(endpoint, len(body), len(compressed))
+    return Response(
+        content=compressed,
+        media_type="application/json",
+        headers={**headers, "Content-Encoding": encoding}
+    )
+
+def endpoint_name(scope) -> str:
+    """Route template (e.g. /api/v1/products/{product_id}) when known"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+class CompressionMiddleware:
+    """
+    gzip/brotli response compression with a size threshold. Responses that
+    already carry a Content-Encoding (such as precompressed cached pages)
+    pass through untouched; streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 5, stats: CompressionStats = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope, encoding: str, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.passthrough = False
+        self.compressor = None
+        self.original_size = 0
+        self.sent_size = 0
+
+    def _stream_compressor(self):
+        if self.encoding == "br":
+            compressor = brotli.Compressor(quality=self.middleware.brotli_quality)
+            return compressor.process, compressor.flush, compressor.finish
+        compressor = zlib.compressobj(self.middleware.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+    @staticmethod
+    def _weaken_etag(headers):
+        # The compressed bytes differ from the ones the route's strong ETag named
+        if "etag" in headers:
+            headers["ETag"] = weak_etag(headers["etag"])
+
+    def _record(self):
+        if self.middleware.stats is not None:
+            self.middleware.stats.record(endpoint_name(self.scope), self.original_size, self.sent_size)
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or not is_compressible(headers.get("content-type")):
+                self.passthrough = True
+                await self._send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        self.original_size += len(body)
+
+        if self.compressor is None and self.start_message is not None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not more_body:
+                # Whole body in one message: compress it if it is big enough
+                if len(body) >= self.middleware.minimum_size:
+                    body = compress(body, self.encoding, self.middleware.gzip_level,
+                                    self.middleware.brotli_quality)
+                    headers["Content-Encoding"] = self.encoding
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    self._weaken_etag(headers)
+                self.sent_size += len(body)
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": body})
+                self.start_message = None
+                self._record()
+                return
+
+            # Streaming response: compress each chunk as it is produced
+            self.compressor = self._stream_compressor()
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self._weaken_etag(headers)
+            if "content-length" in headers:
+                del headers["content-length"]
+            await self._send(self.start_message)
+            self.start_message = None
+
+        process, flush, finish = self.compressor
+        chunk = process(body) + (flush() if more_body else finish())
+        self.sent_size += len(chunk)
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        if not more_body:
+            self._record()
+
+compression_stats = CompressionStats()
+precompressed_cache = PrecompressedCache(settings.PRECOMPRESSED_CACHE_SIZE)
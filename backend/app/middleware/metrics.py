@@ -0,0 +1,59 @@
+from starlette.datastructures import MutableHeaders
+from app.utils.metrics import RequestMetrics
+import time
+
+def server_timing(spans: dict, total: float) -> str:
+    """Server-Timing header value: one entry per span plus the total"""
+    entries = []
+    for span, entry in spans.items():
+        description = f"{entry['calls']} calls"
+        if entry["documents"]:
+            description += f", {entry['documents']} docs"
+        entries.append(f'{span};dur={entry["duration"] * 1000:.2f};desc="{description}"')
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+def route_name(scope) -> str:
+    """Route template for labels; unmatched paths share one label to bound cardinality"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """
+    Records latency, status, response size and in-flight requests per
+    route, and adds a Server-Timing header listing where the request's
+    time went (storage, auth, serialization).
+    """
+
+    def __init__(self, app, metrics: RequestMetrics, server_timing_header: bool = True):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing_header = server_timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        spans = self.metrics.start_request()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing_header:
+                    headers = MutableHeaders(raw=message["headers"])
+                    headers.append("Server-Timing", server_timing(spans, time.perf_counter() - started))
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.finish_request(
+                scope["method"], route_name(scope), status, time.perf_counter() - started, size, spans
+            )
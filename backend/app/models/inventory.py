@@ -0,0 +1,35 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import datetime
+
+class StockUpdate(BaseModel):
+    quantity: int = Field(..., ge=0, description="Stock on hand for this size, including units held by open reservations")
+    shards: Optional[int] = Field(None, ge=1, le=64, description="Shard documents to spread the stock over (more for hot SKUs)")
+
+class StockLevel(BaseModel):
+    product_id: str
+    size: str
+    available: int
+    held: int = Field(0, description="Units held by open reservations")
+    shards: int
+
+class ProductStock(BaseModel):
+    product_id: str
+    sizes: Dict[str, int] = Field(default_factory=dict, description="Available stock per size")
+
+class ReservationItem(BaseModel):
+    product_id: str = Field(..., min_length=1)
+    size: str = Field(..., min_length=1)
+    quantity: int = Field(..., gt=0)
+
+class ReservationRequest(BaseModel):
+    items: List[ReservationItem] = Field(..., min_length=1, max_length=50, description="Reserved all together or not at all")
+    ttl_seconds: Optional[float] = Field(None, gt=0, le=3600, description="Seconds to hold the stock before it is released, capped by the server")
+
+class ReservationResponse(BaseModel):
+    id: str
+    status: str = Field(..., description="reserved, committed, released or expired")
+    items: List[ReservationItem]
+    expires_at: float = Field(..., description="Unix time the reservation is released unless committed")
+    created_at: datetime
+    release_token: Optional[str] = Field(None, description="Sent back as X-Reservation-Token to release the reservation; only returned when it is made")
@@ -1,11 +1,16 @@
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Union
+from pydantic import BaseModel, Field, computed_field, validator
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 from fastapi import UploadFile
+from app.utils.image_urls import image_variants
 
 class ProductSize(BaseModel):
     size: str = Field(..., description="Size (XS, S, M, L, XL, XXL)")
-    stock: int = Field(ge=0, description="Stock quantity for this size")
+    stock: int = Field(ge=0, description="Initial stock for this size; the inventory is seeded from it")
+
+class ProductSizeResponse(BaseModel):
+    """A size as shown to customers; live stock comes from GET /inventory/{product_id}"""
+    size: str
 
 class ProductColor(BaseModel):
     name: str = Field(..., description="Color name")
@@ -157,8 +162,15 @@ class ProductUpdateForm(BaseModel):
 
 class ProductResponse(ProductBase):
     id: str = Field(..., description="Product ID")
+    # Stored sizes[].stock only seeds the inventory and goes stale after the first sale
+    sizes: List[ProductSizeResponse] = Field(default_factory=list, description="Available sizes")
     created_at: datetime = Field(..., description="Creation timestamp")
     updated_at: datetime = Field(..., description="Last update timestamp")
+
+    @computed_field(description="Resized image URLs (thumb, card, detail) for each of `images`")
+    @property
+    def image_variants(self) -> List[Dict[str, str]]:
+        return image_variants(self.images)
     
     @property
     def discount_percentage(self) -> float:
@@ -177,9 +189,27 @@ class ProductResponse(ProductBase):
         """Get just the color names as a list"""
         return [color.name for color in self.colors]
 
+class ProductCardResponse(BaseModel):
+    """Product grid card (`view=card`): only the first image is included"""
+    id: str
+    name: str
+    price: float
+    original_price: Optional[float] = None
+    category: str
+    images: List[str] = Field(default_factory=list)
+    image_variants: List[Dict[str, str]] = Field(default_factory=list)
+
 class ProductListResponse(BaseModel):
-    products: List[ProductResponse]
+    products: List[Union[ProductResponse, ProductCardResponse]]
     total: int
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page")
+
+class ProductBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description="Product IDs to fetch")
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]
+    missing: List[str] = Field(default_factory=list, description="Requested IDs that do not exist")
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.concurrency import run_in_threadpool
 from app.auth.google_auth import get_current_admin, google_auth  # ✅ Correct imports
+from app.utils.metrics import request_metrics
 from pydantic import BaseModel
 import logging
 
@@ -18,7 +20,8 @@ class LoginResponse(BaseModel):
 async def admin_google_login(login_data: GoogleLoginRequest):
     """Admin login with Google authentication"""
     try:
-        admin_user = google_auth.verify_admin_token(login_data.id_token)
+        with request_metrics.span("auth", "verify_admin_token"):
+            admin_user = await run_in_threadpool(google_auth.verify_admin_token, login_data.id_token)
         
         logger.info(f"Successful admin login: {admin_user['email']}")
         
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import RedirectResponse
+from app.services.image_proxy import image_proxy, negotiate_format, ImageFetchError, MEDIA_TYPES
+from app.auth.google_auth import get_current_admin
+from app.utils.image_urls import IMAGE_VARIANTS
+from app.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/images", tags=["Images"])
+
+@router.get("/meta/cache")
+async def get_image_cache_stats(current_admin = Depends(get_current_admin)):
+    """Get image disk cache size and hit/miss/eviction counters - ADMIN ONLY"""
+    return {
+        **image_proxy.cache.stats(),
+        "enabled": image_proxy.enabled,
+        "formats": image_proxy.formats,
+    }
+
+@router.get("/{variant}")
+async def get_image(
+    variant: str,
+    request: Request,
+    url: str = Query(..., description="Original image URL, as stored in the product's `images`")
+):
+    """
+    A product image resized to a named variant (thumb, card, detail) and
+    re-encoded as AVIF or WebP when the browser accepts it - PUBLIC ACCESS
+    """
+    if variant not in IMAGE_VARIANTS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown image variant; expected one of {', '.join(IMAGE_VARIANTS)}"
+        )
+    if not image_proxy.is_allowed(url):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Image URL is not from an allowed host"
+        )
+    if not image_proxy.enabled:
+        # Without Pillow there is nothing to resize; let the browser load the original
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+    image_format = negotiate_format(request.headers.get("accept"), image_proxy.formats)
+    # Stored image URLs never change content, so the rendering is immutable
+    etag = make_etag("image", url, variant, image_format)
+    headers = {**cache_headers(etag, settings.IMAGES_CACHE_CONTROL), "Vary": "Accept"}
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+
+    try:
+        body = await image_proxy.get(url, variant, image_format)
+    except ImageFetchError as e:
+        logger.warning(f"Image fetch failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not fetch the original image"
+        )
+    except Exception as e:
+        logger.error(f"Error rendering image: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not process the image"
+        )
+    return Response(content=body, media_type=MEDIA_TYPES[image_format], headers=headers)
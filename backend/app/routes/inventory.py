@@ -0,0 +1,117 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, status
+from fastapi.responses import ORJSONResponse
+from app.models.inventory import (
+    StockUpdate, StockLevel, ProductStock, ReservationRequest, ReservationResponse
+)
+from app.services.inventory import get_inventory, InsufficientStock, ReservationError
+from app.auth.google_auth import get_current_admin
+from app.auth.service_auth import get_current_backend, get_optional_backend, client_address
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/inventory", tags=["Inventory"], default_response_class=ORJSONResponse)
+
+def _reservation_error(error: ReservationError) -> HTTPException:
+    if error.status == "missing":
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(error))
+    if error.status == "limit":
+        return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(error))
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+
+@router.get("/meta/stats")
+async def get_inventory_stats(current_admin = Depends(get_current_admin), inventory = Depends(get_inventory)):
+    """Get reservation, rejection, retry and expiry counters - ADMIN ONLY"""
+    return inventory.stats()
+
+@router.get("/{product_id}", response_model=ProductStock)
+async def get_stock(product_id: str, inventory = Depends(get_inventory)):
+    """Get available stock per size - PUBLIC ACCESS"""
+    try:
+        return {"product_id": product_id, "sizes": await inventory.get_stock(product_id)}
+    except Exception as e:
+        logger.error(f"Error getting stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get stock"
+        )
+
+@router.put("/{product_id}/{size}", response_model=StockLevel)
+async def set_stock(product_id: str, size: str, update: StockUpdate,
+                    current_admin = Depends(get_current_admin), inventory = Depends(get_inventory)):
+    """Set the available stock of one size - ADMIN ONLY"""
+    try:
+        level = await inventory.set_stock(product_id, size, update.quantity, update.shards)
+        logger.info(f"Stock of {product_id}/{size} set by admin {current_admin['email']}")
+        return level
+    except Exception as e:
+        logger.error(f"Error setting stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to set stock"
+        )
+
+@router.post("/reservations", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(reservation: ReservationRequest, request: Request,
+                             caller = Depends(get_optional_backend), inventory = Depends(get_inventory)):
+    """
+    Hold stock for a checkout - PUBLIC ACCESS. Every item is reserved or
+    none is; the payment backend commits the reservation once paid, or it
+    is released. Customers are limited in units, hold time and open
+    reservations; the backend and admins are not. The response carries the
+    release token the customer needs to release it.
+    """
+    try:
+        return await inventory.reserve(
+            [item.model_dump() for item in reservation.items], reservation.ttl_seconds,
+            client=None if caller else client_address(request)
+        )
+    except InsufficientStock as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Insufficient stock", "items": e.shortages}
+        )
+    except ReservationError as e:
+        raise _reservation_error(e)
+    except Exception as e:
+        logger.error(f"Error reserving stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to reserve stock"
+        )
+
+@router.post("/reservations/{reservation_id}/commit", response_model=ReservationResponse)
+async def commit_reservation(reservation_id: str, caller = Depends(get_current_backend),
+                             inventory = Depends(get_inventory)):
+    """Confirm a reservation after payment - PAYMENT BACKEND OR ADMIN ONLY"""
+    try:
+        return await inventory.commit(reservation_id)
+    except ReservationError as e:
+        raise _reservation_error(e)
+    except Exception as e:
+        logger.error(f"Error committing reservation: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to commit reservation"
+        )
+
+@router.post("/reservations/{reservation_id}/release", response_model=ReservationResponse)
+async def release_reservation(reservation_id: str, x_reservation_token: Optional[str] = Header(None),
+                              caller = Depends(get_optional_backend), inventory = Depends(get_inventory)):
+    """
+    Give a reservation's stock back, e.g. when checkout is abandoned -
+    PUBLIC ACCESS, but customers must send the reservation's release token
+    as X-Reservation-Token
+    """
+    try:
+        return await inventory.release(
+            reservation_id, release_token=None if caller else (x_reservation_token or "")
+        )
+    except ReservationError as e:
+        raise _reservation_error(e)
+    except Exception as e:
+        logger.error(f"Error releasing reservation: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to release reservation"
+        )
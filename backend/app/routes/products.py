@@ -1,72 +1,179 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status, Form
+from fastapi import APIRouter, HTTPException, Depends, Query, status, Form, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import List, Optional
 from app.models.product import (
     ProductCreate, ProductUpdate, ProductResponse, ProductListResponse,
-    ProductCreateForm, ProductUpdateForm
+    ProductCreateForm, ProductUpdateForm, ProductBatchRequest, ProductBatchResponse
 )
-from app.services.firebase_service import firebase_service
+from app.services.storage import get_storage
+from app.services.catalog_cache import get_catalog_cache
+from app.services.search_index import SearchIndex, rank, ranked_page
+from app.services.single_flight import single_flight
+from app.services.product_import import ProductImporter, iter_import_rows
+from app.services.product_export import export_products, EXPORT_CONTENT_TYPES
 from app.auth.google_auth import get_current_admin
+from app.services.product_serializer import (
+    product_serializer, products_json, products_array, parse_fields, stored_fields
+)
+from app.middleware.compression import precompressed_response
+from app.utils.http_cache import (
+    make_etag, weak_etag, cache_headers, is_not_modified, not_modified_response
+)
+from app.config import settings
 from datetime import datetime
+import asyncio
+import orjson
 import math
 import logging
 import json
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/products", tags=["Products"])
+router = APIRouter(prefix="/products", tags=["Products"], default_response_class=ORJSONResponse)
+
+# Upper bound for /products/batch, matching the largest list page
+MAX_BATCH_IDS = 100
+
+def _product_filters(is_active, category, is_featured):
+    """Translate list query parameters into Firestore where clauses"""
+    filters = [("is_active", "==", is_active)]
+    if category:
+        filters.append(("category", "==", category))
+    if is_featured is not None:
+        filters.append(("is_featured", "==", is_featured))
+    return filters
+
+async def _search_products(storage, catalog_cache, search, is_active, category, is_featured, offset, limit,
+                           cursor=None):
+    """Full-text search over the catalog, most relevant first"""
+    if catalog_cache.is_fresh():
+        return await catalog_cache.search(search, is_active, category, is_featured, offset, limit, cursor)
+
+    # Cold or disabled cache: narrow the candidates server-side and index
+    # just those; the text match itself cannot be pushed down to Firestore
+    async def fetch():
+        candidates = await storage.query_documents(
+            "products", filters=_product_filters(is_active, category, is_featured)
+        )
+        catalog_cache.refresh_in_background()
+        return rank(SearchIndex(candidates).search(search), candidates)
+
+    # Identical concurrent searches share one query and one ranking
+    key = ("search_products", " ".join(search.lower().split()), is_active, category, is_featured)
+    ranked = await single_flight.do(key, fetch)
+    return len(ranked), ranked_page(ranked, offset, limit, cursor)
+
+async def _query_products(storage, catalog_cache, is_active, category, is_featured, offset, limit, cursor, projection=None):
+    """One page of products, newest first, from the cache or from Firestore"""
+    if catalog_cache.is_fresh():
+        # Filtered, newest-first buckets: a lookup plus a slice
+        return await catalog_cache.query(
+            is_active=is_active,
+            category=category,
+            is_featured=is_featured,
+            offset=offset,
+            limit=limit,
+            start_after=cursor
+        )
+
+    # Cold or disabled cache: reads scale with the page size, not the catalog.
+    # The composite indexes this needs are in firestore.indexes.json.
+    filters = _product_filters(is_active, category, is_featured)
+    select = None
+    if projection:
+        # Field mask: only the projected fields plus what ordering and ETags use
+        select = [name for name in stored_fields(projection[0]) if name != "id"] + ["created_at", "updated_at"]
+
+    async def fetch():
+        page_products, total = await asyncio.gather(
+            storage.query_documents(
+                "products",
+                filters=filters,
+                order_by="created_at",
+                descending=True,
+                limit=limit,
+                offset=offset,
+                start_after=cursor,
+                select=select
+            ),
+            storage.count_documents("products", filters=filters)
+        )
+        catalog_cache.refresh_in_background()
+        return total, page_products
+
+    # Identical concurrent page requests (a spike on one category) share one
+    # query. The offset stays in the key: it is used when the cursor is gone
+    key = ("query_products", is_active, category, is_featured, offset, limit, cursor, projection)
+    return await single_flight.do(key, fetch)
 
 # PUBLIC ENDPOINTS (No authentication required)
 @router.get("/", response_model=ProductListResponse)
 async def get_products(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
     category: Optional[str] = Query(None, description="Filter by category"),
     is_active: bool = Query(True, description="Filter by active status"),
     is_featured: Optional[bool] = Query(None, description="Filter by featured status"),
-    search: Optional[str] = Query(None, description="Search in name and description")
+    search: Optional[str] = Query(None, description="Search name, description, category, material and colors"),
+    cursor: Optional[str] = Query(None, description="ID of the last product on the previous page"),
+    view: str = Query("full", pattern="^(card|full)$", description="`card` returns only what product grid cards need"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (overrides view)"),
+    storage = Depends(get_storage),
+    catalog_cache = Depends(get_catalog_cache)
 ):
     """Get all products - PUBLIC ACCESS for frontend"""
     try:
-        all_products = firebase_service.get_all_documents("products")
-        # Apply filters
-        filtered_products = []
-        for product in all_products:
-            if product.get("is_active") != is_active:
-                continue
-            if category and product.get("category") != category:
-                continue
-            if is_featured is not None and product.get("is_featured") != is_featured:
-                continue
-            
-            # Search filter
-            if search:
-                search_term = search.lower()
-                name = product.get("name", "").lower()
-                description = product.get("description", "").lower()
-                if search_term not in name and search_term not in description:
-                    continue
-            
-            filtered_products.append(product)
-
-        # Sort by created_at (newest first)
-        filtered_products.sort(
-            key=lambda x: x.get("created_at", datetime.now()),
-            reverse=True
+        projection = parse_fields(view, fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
 
-        # Pagination
-        total = len(filtered_products)
+    try:
         start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_products = filtered_products[start_idx:end_idx]
 
-        products = [ProductResponse(**product) for product in paginated_products]
+        if search:
+            total, paginated_products = await _search_products(
+                storage, catalog_cache, search, is_active, category or None, is_featured, start_idx, per_page,
+                cursor
+            )
+        else:
+            total, paginated_products = await _query_products(
+                storage, catalog_cache, is_active, category or None, is_featured, start_idx, per_page,
+                cursor, projection
+            )
+
+        # The page's IDs and updated_at stamps determine the body, so a
+        # matching If-None-Match can be answered before any serialization
+        etag = make_etag(
+            "products", page, per_page, category, is_active, is_featured, search, cursor, projection, total,
+            [(product["id"], product.get("updated_at")) for product in paginated_products]
+        )
+        # Weak and varying on Accept-Encoding: the body is sent gzip, brotli or as-is
+        headers = {**cache_headers(weak_etag(etag), settings.PRODUCT_LIST_CACHE_CONTROL),
+                   "Vary": "Accept-Encoding"}
+        if is_not_modified(request, etag):
+            return not_modified_response(headers)
+
+        next_cursor = None
+        if len(paginated_products) == per_page:
+            next_cursor = paginated_products[-1]["id"]
 
-        return ProductListResponse(
-            products=products,
-            total=total,
-            page=page,
-            per_page=per_page,
-            total_pages=math.ceil(total / per_page)
+        # Stored products were validated when first serialized; reuse their
+        # cached JSON instead of rebuilding ProductListResponse per request.
+        # Hot pages are also kept compressed, keyed by their ETag.
+        return precompressed_response(
+            request, "/api/v1/products/", etag, headers,
+            lambda: products_json(
+                paginated_products,
+                projection,
+                total=total,
+                page=page,
+                per_page=per_page,
+                total_pages=math.ceil(total / per_page),
+                next_cursor=next_cursor
+            )
         )
 
     except Exception as e:
@@ -76,18 +183,162 @@ async def get_products(
             detail="Error fetching products"
         )
 
+@router.get("/page-data")
+async def get_page_data(
+    request: Request,
+    product_id: Optional[str] = Query(None, description="Product shown on a detail page"),
+    categories: Optional[str] = Query(None, description="Comma-separated categories to group, e.g. Shirts,Pants"),
+    per_category: int = Query(12, ge=1, le=100, description="Products per category group"),
+    related_limit: int = Query(12, ge=0, le=100, description="Related products from the product's category"),
+    view: str = Query("full", pattern="^(card|full)$", description="`card` trims related and grouped products"),
+    catalog_cache = Depends(get_catalog_cache)
+):
+    """
+    Everything one storefront page needs in a single request - PUBLIC ACCESS.
+    Replaces the detail page's product + category fan-out and the
+    Trending page's per-category list calls with one catalog read.
+    """
+    category_list = list(dict.fromkeys(
+        name.strip() for name in (categories or "").split(",") if name.strip()
+    ))
+    if not product_id and not category_list:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass product_id and/or categories"
+        )
+
+    try:
+        data = await catalog_cache.page_data(product_id, category_list, per_category, related_limit)
+    except Exception as e:
+        logger.error(f"Error fetching page data: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching page data"
+        )
+
+    product = data["product"]
+    if product_id and product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+
+    def stamps(products):
+        return [(item["id"], item.get("updated_at")) for item in products]
+
+    etag = make_etag(
+        "page-data", product_id, per_category, related_limit, view,
+        stamps([product]) if product else None, stamps(data["related"]),
+        [(name, group["total"], stamps(group["products"])) for name, group in data["categories"].items()]
+    )
+    headers = {**cache_headers(weak_etag(etag), settings.PRODUCT_LIST_CACHE_CONTROL),
+               "Vary": "Accept-Encoding"}
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+
+    projection = parse_fields(view)
+
+    def build_body():
+        groups = b",".join(
+            orjson.dumps(name) + b':{"products":' + products_array(group["products"], projection)
+            + b',"total":' + str(group["total"]).encode() + b"}"
+            for name, group in data["categories"].items()
+        )
+        return (
+            b'{"product":' + (product_serializer.to_json(product) if product else b"null")
+            + b',"related":' + products_array(data["related"], projection)
+            + b',"categories":{' + groups + b"}}"
+        )
+
+    return precompressed_response(request, "/api/v1/products/page-data", etag, headers, build_body)
+
+async def _get_products_batch(catalog_cache, ids: List[str]) -> Response:
+    """Look up several products at once, keeping the requested order"""
+    ids = list(dict.fromkeys(product_id.strip() for product_id in ids if product_id.strip()))
+    if not ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No product IDs given"
+        )
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} product IDs per request"
+        )
+
+    try:
+        found = await catalog_cache.get_many(ids)
+    except Exception as e:
+        logger.error(f"Error fetching product batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching products"
+        )
+
+    body = products_json(
+        [found[product_id] for product_id in ids if product_id in found],
+        missing=[product_id for product_id in ids if product_id not in found]
+    )
+    return Response(content=body, media_type="application/json")
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: str = Query(..., description="Comma-separated product IDs"),
+    catalog_cache = Depends(get_catalog_cache)
+):
+    """Get several products by ID in one request (cart, checkout) - PUBLIC ACCESS"""
+    return await _get_products_batch(catalog_cache, ids.split(","))
+
+@router.post("/batch", response_model=ProductBatchResponse)
+async def post_products_batch(batch: ProductBatchRequest, catalog_cache = Depends(get_catalog_cache)):
+    """Get several products by ID, for ID lists too long for a URL - PUBLIC ACCESS"""
+    return await _get_products_batch(catalog_cache, batch.ids)
+
+@router.get("/export")
+async def export_products_feed(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="`ndjson` or `csv`"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    is_active: Optional[bool] = Query(None, description="Filter by active status (default: all)"),
+    is_featured: Optional[bool] = Query(None, description="Filter by featured status"),
+    since: Optional[datetime] = Query(None, description="Only products updated at or after this time, oldest update first"),
+    current_admin = Depends(get_current_admin),
+    storage = Depends(get_storage)
+):
+    """
+    Stream the catalog as NDJSON or CSV for feeds and backups - ADMIN ONLY.
+    With `since`, pass the last row's `updated_at` to the next export to
+    fetch only what changed. CSV uses the bulk import's columns.
+    """
+    logger.info(f"Product export ({format}) started by admin {current_admin['email']}")
+    filename = f"products-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        export_products(storage, format, is_active, category, is_featured, since),
+        media_type=EXPORT_CONTENT_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str):
+async def get_product(product_id: str, request: Request, catalog_cache = Depends(get_catalog_cache)):
     """Get a single product by ID - PUBLIC ACCESS"""
     try:
-        product = firebase_service.get_document("products", product_id)
+        product = await catalog_cache.get(product_id)
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Product not found"
             )
 
-        return ProductResponse(**product)
+        updated_at = product.get("updated_at")
+        etag = make_etag("product", product_id, updated_at)
+        headers = cache_headers(etag, settings.PRODUCT_DETAIL_CACHE_CONTROL, last_modified=updated_at)
+        if is_not_modified(request, etag, last_modified=updated_at):
+            return not_modified_response(headers)
+
+        return Response(
+            content=product_serializer.to_json(product),
+            media_type="application/json",
+            headers=headers
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -112,7 +363,9 @@ async def create_product(
     is_featured: bool = Form(False),
     is_active: bool = Form(True),
     image_urls: str = Form("[]"),  # JSON string of ImgBB URLs
-    current_admin = Depends(get_current_admin)
+    current_admin = Depends(get_current_admin),
+    storage = Depends(get_storage),
+    catalog_cache = Depends(get_catalog_cache)
 ):
     """Create a new product with ImgBB image URLs - ADMIN ONLY"""
     try:
@@ -145,16 +398,15 @@ async def create_product(
 
         # Prepare product data for Firebase
         product_dict = product_create.model_dump()
-        product_dict["created_at"] = datetime.now()
-        product_dict["updated_at"] = datetime.now()
+        product_dict["created_at"] = datetime.utcnow()
+        product_dict["updated_at"] = datetime.utcnow()
         product_dict["created_by"] = current_admin["email"]
 
-        # Add product to Firestore
-        product_id = firebase_service.add_document("products", product_dict)
-        logger.info(f"Product created by admin {current_admin['email']}: {product_id}")
+        # Add product to Firestore; the written data is the response, no re-read
+        created_product = await storage.create_document("products", product_dict)
+        logger.info(f"Product created by admin {current_admin['email']}: {created_product['id']}")
 
-        # Return created product
-        created_product = firebase_service.get_document("products", product_id)
+        catalog_cache.put(created_product)
         return ProductResponse(**created_product)
 
     except HTTPException:
@@ -166,6 +418,44 @@ async def create_product(
             detail=f"Error creating product: {str(e)}"
         )
 
+@router.post("/bulk")
+async def bulk_import_products(
+    request: Request,
+    current_admin = Depends(get_current_admin),
+    storage = Depends(get_storage),
+    catalog_cache = Depends(get_catalog_cache)
+):
+    """
+    Create or update many products in one request - ADMIN ONLY.
+    Accepts a JSON array, NDJSON or CSV body; rows with an `id` update
+    that product, others create one. Reports success or failure per row.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    importer = ProductImporter(current_admin["email"], storage, catalog_cache)
+    try:
+        async for row_number, record, from_csv in iter_import_rows(content_type, request):
+            await importer.add(row_number, record, from_csv)
+        await importer.flush()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid import body: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Error importing products: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing products: {str(e)}"
+        )
+
+    summary = importer.summary()
+    logger.info(
+        f"Bulk import by admin {current_admin['email']}: "
+        f"{summary['created']} created, {summary['updated']} updated, "
+        f"{summary['invalid'] + summary['failed']} rejected"
+    )
+    return summary
+
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: str,
@@ -181,18 +471,12 @@ async def update_product(
     is_featured: Optional[bool] = Form(None),
     is_active: Optional[bool] = Form(None),
     image_urls: Optional[str] = Form(None),  # JSON string of ImgBB URLs
-    current_admin = Depends(get_current_admin)
+    current_admin = Depends(get_current_admin),
+    storage = Depends(get_storage),
+    catalog_cache = Depends(get_catalog_cache)
 ):
     """Update a product with ImgBB image URLs - ADMIN ONLY"""
     try:
-        # Check if product exists
-        existing_product = firebase_service.get_document("products", product_id)
-        if not existing_product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Product not found"
-            )
-
         # Parse image URLs if provided
         images_list = None
         if image_urls is not None:
@@ -231,15 +515,22 @@ async def update_product(
                 update_data[key] = value
         
         # Always update these fields
-        update_data["updated_at"] = datetime.now()
+        update_data["updated_at"] = datetime.utcnow()
         update_data["updated_by"] = current_admin["email"]
 
-        # Update product in Firestore
-        firebase_service.update_document("products", product_id, update_data)
+        # Update product in Firestore; the existence check is part of the write
+        # and the merged final state comes back without another read
+        updated_product = await storage.patch_document(
+            "products", product_id, update_data, base=catalog_cache.peek(product_id)
+        )
+        if not updated_product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
+            )
         logger.info(f"Product updated by admin {current_admin['email']}: {product_id}")
 
-        # Return updated product
-        updated_product = firebase_service.get_document("products", product_id)
+        catalog_cache.put(updated_product)
         return ProductResponse(**updated_product)
 
     except HTTPException:
@@ -254,29 +545,29 @@ async def update_product(
 @router.delete("/{product_id}")
 async def delete_product(
     product_id: str,
-    current_admin = Depends(get_current_admin)
+    current_admin = Depends(get_current_admin),
+    storage = Depends(get_storage),
+    catalog_cache = Depends(get_catalog_cache)
 ):
     """Delete a product - ADMIN ONLY"""
     try:
-        # Check if product exists
-        existing_product = firebase_service.get_document("products", product_id)
-        if not existing_product:
+        # Note: Images remain in ImgBB (they don't expire unless you delete them manually)
+        # ImgBB free tier keeps images indefinitely
+        
+        # Delete product from Firestore; fails instead of no-op if it does not exist
+        deleted = await storage.delete_document("products", product_id, must_exist=True)
+        if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Product not found"
             )
-
-        # Note: Images remain in ImgBB (they don't expire unless you delete them manually)
-        # ImgBB free tier keeps images indefinitely
-        
-        # Delete product from Firestore
-        firebase_service.delete_document("products", product_id)
+        catalog_cache.remove(product_id)
         logger.info(f"Product deleted by admin {current_admin['email']}: {product_id}")
 
         return {
             "message": f"Product {product_id} deleted successfully",
             "deleted_by": current_admin["email"],
-            "deleted_at": datetime.now().isoformat()
+            "deleted_at": datetime.utcnow().isoformat()
         }
 
     except HTTPException:
@@ -289,9 +580,33 @@ async def delete_product(
         )
 
 # Utility endpoint to get categories
+PRODUCT_CATEGORIES = ["Shirts", "T-Shirts", "Pants", "Trending"]
+
 @router.get("/meta/categories")
-async def get_categories():
+async def get_categories(request: Request, response: Response):
     """Get available product categories"""
+    etag = make_etag("categories", PRODUCT_CATEGORIES)
+    headers = cache_headers(etag, settings.CATEGORIES_CACHE_CONTROL)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+
     return {
-        "categories": ["Shirts", "T-Shirts", "Pants", "Trending"]
-    }
\ No newline at end of file
+        "categories": PRODUCT_CATEGORIES
+    }
+
+@router.get("/meta/cache")
+async def get_cache_stats(current_admin = Depends(get_current_admin), catalog_cache = Depends(get_catalog_cache)):
+    """Get catalog cache hit/miss/refresh and coalesced-request counters - ADMIN ONLY"""
+    return {
+        **catalog_cache.stats(),
+        "serializer": product_serializer.stats(),
+        "single_flight": single_flight.stats()
+    }
+
+@router.post("/meta/cache/invalidate")
+async def invalidate_cache(current_admin = Depends(get_current_admin), catalog_cache = Depends(get_catalog_cache)):
+    """Force the catalog cache to reload on the next read - ADMIN ONLY"""
+    catalog_cache.invalidate()
+    logger.info(f"Catalog cache invalidated by admin {current_admin['email']}")
+    return {"message": "Catalog cache invalidated"}
@@ -0,0 +1,641 @@
+from app.config import settings
+from app.services.storage import storage, get_storage
+from app.services.product_index import ProductIndex, ANY, matches_filters
+from app.services.search_index import SearchIndex, rank, ranked_page
+from app.services.product_serializer import product_serializer
+from app.services.catalog_snapshot import CatalogSnapshot
+from app.services.shared_catalog import SharedCatalog
+from app.services.single_flight import single_flight
+from fastapi import Depends
+import threading
+import weakref
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks that the real-time listener is alive, and the
+# first and longest waits between attempts to restart it
+WATCH_CHECK_INTERVAL_SECONDS = 5.0
+WATCH_RETRY_SECONDS = 1.0
+WATCH_MAX_RETRY_SECONDS = 60.0
+
+class CatalogCache:
+    """
+    In-process cache of the decoded documents of one Firestore collection.
+    Reads are served from memory until the TTL expires; writes made through
+    this process patch the cache in place instead of forcing a reload.
+
+    With real-time sync started, a Firestore listener keeps the cache as a
+    live replica instead: it is loaded once from the listener's first
+    snapshot, patched from change events, and never expires while the
+    listener is active. `version` increases with every applied change.
+
+    Given a snapshot, the cache can also start from the copy last written
+    to local disk: those documents are served straight away while a
+    background reload reconciles them with Firestore.
+
+    Given a shared catalog, workers on one host share a single loader: the
+    leader worker refreshes from Firestore (or its listener) and publishes
+    the catalog, and the other workers reload from that copy whenever its
+    version changes instead of querying Firestore themselves.
+    """
+
+    def __init__(self, service, collection_name: str = "products", ttl_seconds: float = 60.0,
+                 enabled: bool = True, snapshot: CatalogSnapshot = None,
+                 snapshot_interval_seconds: float = 300.0, shared: SharedCatalog = None,
+                 shared_interval_seconds: float = 1.0):
+        self.service = service
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._index = ProductIndex()
+        self._search_index = SearchIndex()
+        self._loaded_at = None
+        self._lock = threading.RLock()
+        self._refresh_lock = asyncio.Lock()
+        self._background_refresh = None
+        # Writes made while a reload is in flight, replayed onto its result
+        self._refresh_writes = None
+        self._watch = None
+        self._watch_task = None
+        self._watch_error = None
+        self._synced = False
+        self.snapshot = snapshot
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self._from_snapshot = False
+        self._saved_version = None
+        self._snapshot_task = None
+        self.shared = shared
+        self.shared_interval_seconds = shared_interval_seconds
+        self._shared_version = None
+        self._published_version = None
+        self._refresh_requests = None
+        self._shared_task = None
+        self.realtime = False
+        self.version = 0
+        self.realtime_events = 0
+        self.watch_restarts = 0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def is_fresh(self) -> bool:
+        """Whether the cached collection can be served without a reload"""
+        if self._loaded_at is None or self._from_snapshot:
+            return False
+        if self._follows_shared():
+            # Lock-free check of the leader's version counter
+            return self._shared_version == self.shared.header()["version"]
+        if self.is_live():
+            return True
+        return (time.monotonic() - self._loaded_at) < self.ttl_seconds
+
+    def is_loaded(self) -> bool:
+        """Whether there is anything to serve, fresh or from the snapshot"""
+        return self._loaded_at is not None
+
+    def _follows_shared(self) -> bool:
+        """Whether this worker takes the catalog from a live leader rather than Firestore"""
+        return self.shared is not None and not self.shared.is_leader and self.shared.is_current()
+
+    def is_live(self) -> bool:
+        """Whether a real-time listener is currently keeping the cache current"""
+        return self._synced and self._watch is not None and getattr(self._watch, "is_active", True)
+
+    async def refresh(self):
+        """Reload the whole collection from the shared catalog or from Firestore"""
+        with self._lock:
+            self._refresh_writes = []
+        try:
+            await self._reload()
+        finally:
+            with self._lock:
+                self._refresh_writes = None
+
+    async def _reload(self):
+        shared = None
+        if self._follows_shared():
+            shared = await asyncio.to_thread(self.shared.read)
+        if shared is not None:
+            documents, shared_version = shared
+        else:
+            documents, shared_version = await self.service.get_all_documents(self.collection_name), None
+        # Building the indexes is CPU-bound; keep it off the event loop
+        index, search_index = await asyncio.to_thread(
+            lambda: (ProductIndex(documents), SearchIndex(documents))
+        )
+        previous = self._index
+        with self._lock:
+            # The documents were read before any write made since; keep those writes
+            for doc_id, document in self._refresh_writes:
+                if document is None:
+                    index.remove(doc_id)
+                    search_index.remove(doc_id)
+                else:
+                    index.add(document)
+                    search_index.add(document)
+            self._index = index
+            self._search_index = search_index
+            self._loaded_at = time.monotonic()
+            self._from_snapshot = False
+            self._shared_version = shared_version
+            self.refreshes += 1
+            self.version += 1
+        self._discard_changed(previous, index)
+        source = f"shared catalog v{shared_version}" if shared is not None else "Firestore"
+        logger.info(f"Catalog cache refreshed from {source}: {len(documents)} {self.collection_name}")
+
+    def start_realtime_sync(self):
+        """
+        Subscribe to the collection and keep the cache as a live replica. A
+        background task restarts the listener, with backoff, whenever it dies;
+        until then reads fall back to TTL reloads.
+        """
+        if not self.enabled:
+            return
+        self.realtime = True
+        if self._watch_task is None:
+            self._watch_task = asyncio.get_running_loop().create_task(self._supervise_watch())
+        if self._watch is not None:
+            return
+        if self.shared is not None and not self.shared.try_lead():
+            # The leader's listener serves every worker; this one starts it if it takes over
+            return
+        self._subscribe()
+
+    def _subscribe(self):
+        # The new listener's first snapshot reloads the whole collection
+        self._synced = False
+        try:
+            self._watch = self.service.watch_collection(self.collection_name, self._apply_changes)
+        except Exception as e:
+            self._watch_error = str(e)
+            logger.error(f"Starting real-time sync for {self.collection_name} failed: {e}")
+            return
+        logger.info(f"Real-time sync started for {self.collection_name}")
+
+    def stop_realtime_sync(self):
+        self.realtime = False
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        if self._watch is None:
+            return
+        self._watch.unsubscribe()
+        self._watch = None
+        self._synced = False
+        logger.info(f"Real-time sync stopped for {self.collection_name}")
+
+    def _watch_down(self) -> bool:
+        """Whether this worker should have a listener but it is missing or has died"""
+        if not self.realtime or (self.shared is not None and not self.shared.is_leader):
+            return False
+        return self._watch is None or not getattr(self._watch, "is_active", True)
+
+    def _restart_watch(self):
+        watch, self._watch = self._watch, None
+        if watch is not None:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.debug(f"Closing the dead listener failed: {e}")
+        self.watch_restarts += 1
+        self._subscribe()
+
+    async def _supervise_watch(self):
+        retry_seconds = WATCH_RETRY_SECONDS
+        while True:
+            if not self._watch_down():
+                if self.is_live():
+                    # Synced since the last restart, so the next failure retries quickly again
+                    retry_seconds = WATCH_RETRY_SECONDS
+                await asyncio.sleep(WATCH_CHECK_INTERVAL_SECONDS)
+                continue
+            logger.warning(f"Real-time listener for {self.collection_name} is down; restarting it")
+            self._restart_watch()
+            await asyncio.sleep(retry_seconds)
+            retry_seconds = min(retry_seconds * 2, WATCH_MAX_RETRY_SECONDS)
+
+    def watch_state(self) -> dict:
+        """State of the real-time listener, for readiness checks"""
+        if not self.realtime:
+            state = "off"
+        elif self.shared is not None and not self.shared.is_leader:
+            state = "follower"
+        elif self.is_live():
+            state = "live"
+        elif self._watch_down():
+            state = "down"
+        else:
+            state = "syncing"
+        return {"state": state, "restarts": self.watch_restarts}
+
+    @staticmethod
+    def _discard_changed(previous: ProductIndex, current: ProductIndex):
+        """
+        Drop the cached JSON of every product a reload changed or removed.
+        Serialized bytes are keyed by updated_at, which not every writer bumps
+        """
+        for product in current.all():
+            if previous.get(product["id"]) != product:
+                product_serializer.discard(product["id"])
+        for product in previous.all():
+            if current.get(product["id"]) is None:
+                product_serializer.discard(product["id"])
+
+    def _apply_changes(self, events: list):
+        """Listener callback (Firestore thread): apply added/modified/removed events"""
+        if not self._synced:
+            # The first snapshot is the whole collection
+            documents = [document for change_type, _, document in events if document is not None]
+            index, search_index = ProductIndex(documents), SearchIndex(documents)
+            previous = self._index
+            with self._lock:
+                self._index = index
+                self._search_index = search_index
+                self._loaded_at = time.monotonic()
+                self._from_snapshot = False
+                self._synced = True
+                self._watch_error = None
+                self.refreshes += 1
+                self.version += 1
+            self._discard_changed(previous, index)
+            logger.info(f"Real-time replica loaded: {len(documents)} {self.collection_name}")
+            return
+
+        for _, doc_id, _ in events:
+            product_serializer.discard(doc_id)
+        with self._lock:
+            for change_type, doc_id, document in events:
+                if change_type == "removed":
+                    self._index.remove(doc_id)
+                    self._search_index.remove(doc_id)
+                else:
+                    self._index.add(document)
+                    self._search_index.add(document)
+            self.realtime_events += len(events)
+            self.version += 1
+
+    def load_snapshot(self) -> bool:
+        """Fill an empty cache from the on-disk snapshot, if there is one"""
+        if not self.enabled or self.snapshot is None or self._loaded_at is not None:
+            return False
+        loaded = self.snapshot.load()
+        if loaded is None:
+            return False
+        documents, header = loaded
+        index, search_index = ProductIndex(documents), SearchIndex(documents)
+        with self._lock:
+            if self._loaded_at is not None:
+                return False
+            self._index = index
+            self._search_index = search_index
+            self._loaded_at = time.monotonic()
+            self._from_snapshot = True
+            self.version = header["version"]
+            self._saved_version = header["version"]
+        age = round(time.time() - header["saved_at"], 1)
+        logger.info(f"Catalog cache loaded from snapshot: {len(documents)} {self.collection_name}, {age}s old")
+        return True
+
+    def save_snapshot(self) -> bool:
+        """Write the cached documents to disk if they changed since the last save"""
+        if self.snapshot is None or (self.shared is not None and not self.shared.is_leader):
+            return False
+        with self._lock:
+            if self._loaded_at is None or self._from_snapshot or self.version == self._saved_version:
+                return False
+            documents = self._index.all()
+            version = self.version
+        self.snapshot.save(documents, version)
+        self._saved_version = version
+        logger.info(f"Catalog snapshot saved: {len(documents)} {self.collection_name}, version {version}")
+        return True
+
+    def start_snapshots(self):
+        """Save the snapshot every `snapshot_interval_seconds` from a background task"""
+        if not self.enabled or self.snapshot is None or self._snapshot_task is not None:
+            return
+        self._snapshot_task = asyncio.get_running_loop().create_task(self._save_snapshots())
+
+    async def stop_snapshots(self):
+        """Stop the background task and write a final snapshot"""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        if self.enabled and self.snapshot is not None:
+            await asyncio.to_thread(self.save_snapshot)
+
+    async def _save_snapshots(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval_seconds)
+            try:
+                await asyncio.to_thread(self.save_snapshot)
+            except Exception as e:
+                logger.error(f"Saving catalog snapshot failed: {e}")
+
+    def start_sharing(self):
+        """Lead or follow the shared catalog from a background task"""
+        if not self.enabled or self.shared is None or self._shared_task is not None:
+            return
+        self._shared_task = asyncio.get_running_loop().create_task(self._share())
+
+    async def stop_sharing(self):
+        """Stop the background task and hand leadership to another worker"""
+        if self._shared_task is not None:
+            self._shared_task.cancel()
+            self._shared_task = None
+        if self.shared is not None:
+            self.shared.close()
+
+    async def _share(self):
+        while True:
+            try:
+                await self._share_once()
+            except Exception as e:
+                logger.error(f"Sharing catalog failed: {e}")
+            await asyncio.sleep(self.shared_interval_seconds)
+
+    async def _share_once(self):
+        """
+        Leader: keep the cache current and publish each new version, or a
+        heartbeat when nothing changed. Followers reload each new version
+        and take over if the leader goes away.
+        """
+        if not self.shared.try_lead():
+            # Pick up each new version as soon as it is published
+            if self.shared.is_current() and not self.is_fresh():
+                await self._ensure_fresh(allow_snapshot=False)
+            return
+        if self.realtime and self._watch is None:
+            self.start_realtime_sync()
+        requests = self.shared.refresh_requests()
+        if self._refresh_requests is not None and requests != self._refresh_requests and not self.is_live():
+            # Another worker wrote to Firestore; reload so every worker sees it
+            async with self._refresh_lock:
+                await self.refresh()
+        self._refresh_requests = requests
+        if not self.is_fresh():
+            await self._ensure_fresh(allow_snapshot=False)
+
+        with self._lock:
+            version = self.version
+            documents = self._index.all() if version != self._published_version else None
+        if documents is None:
+            await asyncio.to_thread(self.shared.heartbeat)
+            return
+        shared_version = await asyncio.to_thread(self.shared.publish, documents)
+        self._published_version = version
+        logger.info(f"Shared catalog v{shared_version} published: {len(documents)} {self.collection_name}")
+
+    def _serve_snapshot(self) -> bool:
+        """
+        Whether snapshot documents may answer a read while they are being
+        reconciled. Starts the reconciling reload unless a listener will.
+        """
+        if not self._from_snapshot:
+            return False
+        if self._watch is None:
+            self.refresh_in_background()
+        return True
+
+    def refresh_in_background(self):
+        """
+        Warm the cache in a background task so the caller can answer the
+        current request with a cheaper, paginated Firestore query instead.
+        """
+        if not self.enabled:
+            return
+        if self._background_refresh and not self._background_refresh.done():
+            return
+        self._background_refresh = asyncio.get_running_loop().create_task(self._refresh_quietly())
+
+    async def _refresh_quietly(self):
+        try:
+            await self._ensure_fresh(allow_snapshot=False)
+        except Exception as e:
+            logger.error(f"Background catalog cache refresh failed: {e}")
+
+    async def _ensure_fresh(self, allow_snapshot: bool = True):
+        if self.is_fresh() or (allow_snapshot and self._serve_snapshot()):
+            self.hits += 1
+            return
+        async with self._refresh_lock:
+            # Another request may have reloaded while this one waited
+            if self.is_fresh():
+                self.hits += 1
+                return
+            self.misses += 1
+            await self.refresh()
+
+    async def get_all(self) -> list:
+        """Get all cached documents, reloading them if the TTL has expired"""
+        await self._ensure_fresh()
+        with self._lock:
+            return self._index.all()
+
+    async def get(self, doc_id: str):
+        """Get a single document, from memory when the cache is fresh"""
+        with self._lock:
+            if self.is_fresh() or self._serve_snapshot():
+                self.hits += 1
+                return self._index.get(doc_id)
+            self.misses += 1
+        # A cold cache is not worth a full reload for a single document;
+        # concurrent misses for the same one share a single read
+        return await single_flight.do(
+            ("get_document", self.collection_name, doc_id),
+            lambda: self.service.get_document(self.collection_name, doc_id)
+        )
+
+    async def get_many(self, doc_ids: list) -> dict:
+        """
+        Get several documents by ID as {id: document}. A fresh cache answers
+        from memory; otherwise one multi-document read fetches them all.
+        """
+        with self._lock:
+            if self.is_fresh() or self._serve_snapshot():
+                self.hits += 1
+                documents = {}
+                for doc_id in doc_ids:
+                    document = self._index.get(doc_id)
+                    if document is not None:
+                        documents[doc_id] = document
+                return documents
+            self.misses += 1
+        return await single_flight.do(
+            ("get_documents", self.collection_name, tuple(sorted(set(doc_ids)))),
+            lambda: self.service.get_documents(self.collection_name, doc_ids)
+        )
+
+    def peek(self, doc_id: str):
+        """Get a document only if the cache is fresh, never touching Firestore"""
+        with self._lock:
+            if self.is_fresh():
+                return self._index.get(doc_id)
+            return None
+
+    async def query(self, is_active: bool, category: str = ANY, is_featured: bool = ANY,
+                    offset: int = 0, limit: int = 10, start_after: str = None):
+        """
+        Get one page of documents matching the filters, newest first.
+        Returns (total, page) straight from the secondary index.
+        """
+        await self._ensure_fresh()
+        with self._lock:
+            if start_after:
+                position = self._index.position_after(start_after, is_active, category, is_featured)
+                if position is not None:
+                    offset = position
+            total = self._index.count(is_active, category, is_featured)
+            page = self._index.page(is_active, category, is_featured, offset, limit)
+            return total, page
+
+    async def search(self, text: str, is_active: bool, category: str = ANY, is_featured: bool = ANY,
+                     offset: int = 0, limit: int = 10, start_after: str = None):
+        """
+        Full-text search through the inverted index, most relevant first.
+        Returns (total, page).
+        """
+        await self._ensure_fresh()
+        with self._lock:
+            scores = self._search_index.search(text)
+            candidates = [
+                product for product in map(self._index.get, scores)
+                if product is not None and matches_filters(product, is_active, category, is_featured)
+            ]
+        ranked = rank(scores, candidates)
+        return len(ranked), ranked_page(ranked, offset, limit, start_after)
+
+    async def page_data(self, product_id: str = None, categories: list = (), per_category: int = 12,
+                        related_limit: int = 12) -> dict:
+        """
+        Everything a storefront page needs from one catalog read: the
+        product, active products from its category ("related") and one
+        newest-first group per requested category.
+        """
+        if self.enabled:
+            await self._ensure_fresh()
+            index, lock = self._index, self._lock
+        else:
+            documents = await single_flight.do(
+                ("get_all_documents", self.collection_name),
+                lambda: self.service.get_all_documents(self.collection_name)
+            )
+            index, lock = await asyncio.to_thread(ProductIndex, documents), threading.Lock()
+
+        with lock:
+            product = index.get(product_id) if product_id else None
+            related = []
+            if product is not None and product.get("category"):
+                candidates = index.page(True, product["category"], ANY, 0, related_limit + 1)
+                related = [item for item in candidates if item["id"] != product_id][:related_limit]
+
+            groups = {}
+            for category in categories:
+                groups[category] = {
+                    "products": index.page(True, category, ANY, 0, per_category),
+                    "total": index.count(True, category, ANY),
+                }
+            return {"product": product, "related": related, "categories": groups}
+
+    def put(self, document: dict):
+        """Insert or replace a document after it has been written"""
+        product_serializer.discard(document["id"])
+        with self._lock:
+            if self._refresh_writes is not None:
+                self._refresh_writes.append((document["id"], document))
+            if self._loaded_at is not None:
+                self._index.add(document)
+                self._search_index.add(document)
+                self.version += 1
+        self._request_shared_refresh()
+
+    def remove(self, doc_id: str):
+        """Drop a document after it has been deleted"""
+        product_serializer.discard(doc_id)
+        with self._lock:
+            if self._refresh_writes is not None:
+                self._refresh_writes.append((doc_id, None))
+            self._index.remove(doc_id)
+            self._search_index.remove(doc_id)
+            self.version += 1
+        self._request_shared_refresh()
+
+    def _request_shared_refresh(self):
+        # Followers keep their own patched copy until the leader republishes
+        if self.shared is not None and not self.shared.is_leader:
+            self.shared.request_refresh()
+
+    def invalidate(self):
+        """Force the next read to reload from Firestore"""
+        with self._lock:
+            self._loaded_at = None
+            self._from_snapshot = False
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Hit/miss/refresh counters for monitoring"""
+        with self._lock:
+            age = None
+            if self._loaded_at is not None:
+                age = round(time.monotonic() - self._loaded_at, 3)
+            return {
+                "collection": self.collection_name,
+                "documents": len(self._index),
+                "ttl_seconds": self.ttl_seconds,
+                "age_seconds": age,
+                "enabled": self.enabled,
+                "realtime": self.is_live(),
+                "realtime_events": self.realtime_events,
+                "watch_restarts": self.watch_restarts,
+                "watch_error": self._watch_error,
+                "version": self.version,
+                "from_snapshot": self._from_snapshot,
+                "snapshot_version": self._saved_version,
+                "shared_role": None if self.shared is None else ("leader" if self.shared.is_leader else "follower"),
+                "shared_version": self._shared_version,
+                "fresh": self.is_fresh(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "invalidations": self.invalidations,
+            }
+
+catalog_cache = CatalogCache(
+    storage,
+    "products",
+    ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS,
+    enabled=settings.CATALOG_CACHE_ENABLED,
+    snapshot=CatalogSnapshot(settings.CATALOG_SNAPSHOT_PATH) if settings.CATALOG_SNAPSHOT_PATH else None,
+    snapshot_interval_seconds=settings.CATALOG_SNAPSHOT_INTERVAL_SECONDS,
+    shared=SharedCatalog(
+        settings.SHARED_CATALOG_PATH,
+        stale_after_seconds=max(10.0, 5 * settings.SHARED_CATALOG_INTERVAL_SECONDS)
+    ) if settings.SHARED_CATALOG_PATH else None,
+    shared_interval_seconds=settings.SHARED_CATALOG_INTERVAL_SECONDS,
+)
+
+# Caches over storages that replace the default one through dependency overrides
+_override_caches = weakref.WeakKeyDictionary()
+
+def get_catalog_cache(storage = Depends(get_storage)) -> CatalogCache:
+    """
+    FastAPI dependency for the catalog cache over the storage routes use.
+    When get_storage is overridden the cache follows it, as a plain TTL
+    cache without snapshot or sharing
+    """
+    if storage is catalog_cache.service:
+        return catalog_cache
+    cache = _override_caches.get(storage)
+    if cache is None:
+        cache = _override_caches[storage] = CatalogCache(
+            storage,
+            "products",
+            ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS,
+            enabled=settings.CATALOG_CACHE_ENABLED,
+        )
+    return cache
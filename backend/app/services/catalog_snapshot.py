@@ -0,0 +1,67 @@
+from app.utils.json_documents import encode_value, decode_document
+import orjson
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+class CatalogSnapshot:
+    """
+    On-disk copy of a cached collection, so a freshly started worker can
+    answer from local disk before Firestore has been reached.
+
+    Stored as JSON lines: a header with the format, cache version and save
+    time, then one document per line. Writes go to a temporary file that
+    is renamed into place, so a crash never leaves a half-written snapshot.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def save(self, documents: list, version: int):
+        """Write the documents and the cache version they correspond to"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        header = {"format": SNAPSHOT_FORMAT, "version": version, "saved_at": time.time(),
+                  "count": len(documents)}
+        # Per process, so workers saving at the same time never share a file
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(orjson.dumps(header) + b"\n")
+                for document in documents:
+                    file.write(orjson.dumps(document, default=encode_value) + b"\n")
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def load(self):
+        """
+        Read the snapshot back as (documents, header), or None when there is
+        no usable snapshot
+        """
+        try:
+            with open(self.path, "rb") as file:
+                header = orjson.loads(file.readline())
+                if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+                    logger.warning(f"Ignoring catalog snapshot with unknown format: {self.path}")
+                    return None
+                documents = [decode_document(orjson.loads(line)) for line in file if line.strip()]
+        except FileNotFoundError:
+            return None
+        except (OSError, orjson.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable catalog snapshot {self.path}: {e}")
+            return None
+
+        if len(documents) != header.get("count"):
+            logger.warning(f"Ignoring truncated catalog snapshot: {self.path}")
+            return None
+        return documents, header
@@ -1,28 +1,57 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 from app.config import settings
+from app.services.storage_backend import StorageBackend
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
-class FirebaseService:
+class FirebaseService(StorageBackend):
+    """
+    Firestore storage backend. The Firebase SDK is imported and the
+    client created on first use (or by an explicit warm-up), not at import
+    time, so the app boots and answers liveness checks without credentials
+    or network access.
+    """
+
     def __init__(self):
-        self.db = None
+        self._db = None
+        self._init_lock = threading.Lock()
+        self.init_error = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self.initialize_firebase()
+        return self._db
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._db is not None
+
+    def initialize(self):
         self.initialize_firebase()
-    
+
     def initialize_firebase(self):
-        try:
-            if not firebase_admin._apps:
-                cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
-                firebase_admin.initialize_app(cred, {
-                    'projectId': settings.FIREBASE_PROJECT_ID,
-                })
-            
-            self.db = firestore.client()
-            logger.info("Firebase initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Firebase: {e}")
-            raise
+        with self._init_lock:
+            if self._db is not None:
+                return
+            try:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+
+                if not firebase_admin._apps:
+                    cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
+                    firebase_admin.initialize_app(cred, {
+                        'projectId': settings.FIREBASE_PROJECT_ID,
+                    })
+
+                self._db = firestore.client()
+                self.init_error = None
+                logger.info("Firebase initialized successfully")
+            except Exception as e:
+                self.init_error = str(e)
+                logger.error(f"Failed to initialize Firebase: {e}")
+                raise
     
     def get_collection(self, collection_name: str):
         """Get a Firestore collection reference"""
@@ -37,6 +66,15 @@ class FirebaseService:
             logger.error(f"Error adding document: {e}")
             raise
     
+    def create_document(self, collection_name: str, data: dict) -> dict:
+        """Add a document and return it as stored, without reading it back"""
+        try:
+            _, doc_ref = self.db.collection(collection_name).add(data)
+            return {"id": doc_ref.id, **data}
+        except Exception as e:
+            logger.error(f"Error creating document: {e}")
+            raise
+
     def get_document(self, collection_name: str, doc_id: str):
         """Get a document by ID"""
         try:
@@ -48,6 +86,22 @@ class FirebaseService:
             logger.error(f"Error getting document: {e}")
             raise
     
+    def get_documents(self, collection_name: str, doc_ids: list) -> dict:
+        """Get several documents by ID in one round trip. Missing IDs are left out"""
+        try:
+            collection = self.db.collection(collection_name)
+            refs = [collection.document(doc_id) for doc_id in dict.fromkeys(doc_ids)]
+            if not refs:
+                return {}
+            return {
+                doc.id: {"id": doc.id, **doc.to_dict()}
+                for doc in self.db.get_all(refs)
+                if doc.exists
+            }
+        except Exception as e:
+            logger.error(f"Error getting documents: {e}")
+            raise
+
     def get_all_documents(self, collection_name: str):
         """Get all documents from a collection"""
         try:
@@ -57,6 +111,106 @@ class FirebaseService:
             logger.error(f"Error getting documents: {e}")
             raise
     
+    def _build_query(self, collection_name: str, filters: list = None):
+        """Apply (field, op, value) filters as server-side where clauses"""
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = self.db.collection(collection_name)
+        for field, op, value in filters or []:
+            query = query.where(filter=FieldFilter(field, op, value))
+        return query
+
+    def query_documents(
+        self,
+        collection_name: str,
+        filters: list = None,
+        order_by: str = None,
+        descending: bool = False,
+        limit: int = None,
+        offset: int = None,
+        start_after: str = None,
+        select: list = None
+    ):
+        """
+        Query a collection with filtering, ordering and pagination pushed
+        down to Firestore. `start_after` is the ID of the last document of
+        the previous page; prefer it over `offset`, which Firestore still
+        bills as reads for every skipped document, and which is used instead
+        when the cursor document no longer exists. `select` limits the
+        fields Firestore sends back.
+        """
+        from firebase_admin import firestore
+
+        try:
+            query = self._build_query(collection_name, filters)
+            if select:
+                query = query.select(select)
+            if order_by:
+                direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+                query = query.order_by(order_by, direction=direction)
+            cursor = self.db.collection(collection_name).document(start_after).get() if start_after else None
+            if cursor is not None and cursor.exists:
+                query = query.start_after(cursor)
+            elif offset:
+                # No cursor, or its document has been deleted since the previous page
+                query = query.offset(offset)
+            if limit:
+                query = query.limit(limit)
+            return [{"id": doc.id, **doc.to_dict()} for doc in query.stream()]
+        except Exception as e:
+            logger.error(f"Error querying documents: {e}")
+            raise
+
+    def stream_documents(self, collection_name: str, filters: list = None, order_by: str = None):
+        """Iterate over matching documents without loading them all into memory"""
+        try:
+            query = self._build_query(collection_name, filters)
+            if order_by:
+                query = query.order_by(order_by)
+            for doc in query.stream():
+                yield {"id": doc.id, **doc.to_dict()}
+        except Exception as e:
+            logger.error(f"Error streaming documents: {e}")
+            raise
+
+    def watch_collection(self, collection_name: str, on_changes):
+        """
+        Subscribe to real-time changes of a collection. `on_changes` is called
+        from a Firestore background thread with a list of
+        ("added" | "modified" | "removed", doc_id, document) events; the first
+        call lists every document as "added". Returns the watch, which has
+        `unsubscribe()`.
+        """
+        def on_snapshot(collection_snapshot, changes, read_time):
+            events = []
+            for change in changes:
+                change_type = change.type.name.lower()
+                doc = change.document
+                if change_type == "removed":
+                    events.append((change_type, doc.id, None))
+                else:
+                    events.append((change_type, doc.id, {"id": doc.id, **doc.to_dict()}))
+            try:
+                on_changes(events)
+            except Exception as e:
+                logger.error(f"Error applying {collection_name} changes: {e}")
+
+        try:
+            return self.db.collection(collection_name).on_snapshot(on_snapshot)
+        except Exception as e:
+            logger.error(f"Error watching collection: {e}")
+            raise
+
+    def count_documents(self, collection_name: str, filters: list = None) -> int:
+        """Count matching documents with a server-side aggregation query"""
+        try:
+            query = self._build_query(collection_name, filters)
+            results = query.count().get()
+            return int(results[0][0].value)
+        except Exception as e:
+            logger.error(f"Error counting documents: {e}")
+            raise
+
     def update_document(self, collection_name: str, doc_id: str, data: dict):
         """Update a document"""
         try:
@@ -66,13 +220,127 @@ class FirebaseService:
             logger.error(f"Error updating document: {e}")
             raise
     
-    def delete_document(self, collection_name: str, doc_id: str):
-        """Delete a document"""
+    def patch_document(self, collection_name: str, doc_id: str, data: dict, base: dict = None):
+        """
+        Update a document and return its final state, or None if it does not
+        exist. With a known `base` (e.g. the cached copy) this is a single
+        update with an existence precondition; otherwise a transaction reads
+        and writes the document together.
+        """
+        from firebase_admin import firestore
+        from google.api_core.exceptions import NotFound
+
+        doc_ref = self.db.collection(collection_name).document(doc_id)
         try:
-            self.db.collection(collection_name).document(doc_id).delete()
+            if base is not None:
+                try:
+                    doc_ref.update(data)
+                except NotFound:
+                    return None
+                return {**base, **data, "id": doc_id}
+
+            @firestore.transactional
+            def patch_in_transaction(transaction):
+                snapshot = doc_ref.get(transaction=transaction)
+                if not snapshot.exists:
+                    return None
+                transaction.update(doc_ref, data)
+                return {"id": snapshot.id, **snapshot.to_dict(), **data}
+
+            return patch_in_transaction(self.db.transaction())
+        except Exception as e:
+            logger.error(f"Error patching document: {e}")
+            raise
+
+    def delete_document(self, collection_name: str, doc_id: str, must_exist: bool = False):
+        """Delete a document. With `must_exist`, returns False if it was not there"""
+        from google.api_core.exceptions import NotFound
+
+        try:
+            doc_ref = self.db.collection(collection_name).document(doc_id)
+            if not must_exist:
+                doc_ref.delete()
+                return True
+            try:
+                doc_ref.delete(option=self.db.write_option(exists=True))
+            except NotFound:
+                return False
             return True
         except Exception as e:
             logger.error(f"Error deleting document: {e}")
             raise
 
-firebase_service = FirebaseService()
+    def bulk_write(self, collection_name: str, operations: list) -> list:
+        """
+        Commit up to 500 ("create", None, data) / ("update", doc_id, data)
+        operations in one transaction. Updates to missing documents are
+        reported instead of failing the whole batch; the existence check and
+        the writes share the transaction, so a document deleted in between
+        cannot make Firestore reject the commit. Returns one result per
+        operation: {"id", "status", "document"} or {"id", "status", "error"}.
+        """
+        from firebase_admin import firestore
+
+        try:
+            collection = self.db.collection(collection_name)
+            update_refs = [collection.document(doc_id) for op, doc_id, _ in operations if op == "update"]
+            # IDs for new documents are picked once, so a retried transaction reuses them
+            create_refs = [collection.document() for op, _, _ in operations if op == "create"]
+
+            @firestore.transactional
+            def write_in_transaction(transaction):
+                existing = {}
+                if update_refs:
+                    for snapshot in transaction.get_all(update_refs):
+                        if snapshot.exists:
+                            existing[snapshot.id] = snapshot.to_dict()
+
+                new_refs = iter(create_refs)
+                results = []
+                for op, doc_id, data in operations:
+                    if op == "create":
+                        doc_ref = next(new_refs)
+                        transaction.set(doc_ref, data)
+                        results.append({"id": doc_ref.id, "status": "created",
+                                        "document": {"id": doc_ref.id, **data}})
+                    elif doc_id in existing:
+                        transaction.update(collection.document(doc_id), data)
+                        results.append({"id": doc_id, "status": "updated",
+                                        "document": {"id": doc_id, **existing[doc_id], **data}})
+                    else:
+                        results.append({"id": doc_id, "status": "failed", "error": "Document not found"})
+                return results
+
+            return write_in_transaction(self.db.transaction())
+        except Exception as e:
+            logger.error(f"Error committing batch: {e}")
+            raise
+
+    def run_transaction(self, refs: list, update):
+        """
+        Run `update` in a Firestore transaction. Firestore retries it when a
+        document it read is written concurrently, so reads are never stale.
+        """
+        from firebase_admin import firestore
+
+        doc_refs = {ref: self.db.collection(ref[0]).document(ref[1]) for ref in refs}
+        paths = {doc_ref.path: ref for ref, doc_ref in doc_refs.items()}
+
+        @firestore.transactional
+        def update_in_transaction(transaction):
+            documents = dict.fromkeys(refs)
+            if doc_refs:
+                for snapshot in transaction.get_all(list(doc_refs.values())):
+                    if snapshot.exists:
+                        documents[paths[snapshot.reference.path]] = snapshot.to_dict()
+            writes, result = update(documents)
+            for (collection_name, doc_id), data in writes.items():
+                doc_ref = self.db.collection(collection_name).document(doc_id)
+                if data is None:
+                    transaction.delete(doc_ref)
+                else:
+                    transaction.set(doc_ref, data)
+            return result
+
+        # Not logged here: `update` raising is how callers reject a transaction
+        return update_in_transaction(self.db.transaction())
@@ -0,0 +1,291 @@
+from app.config import settings
+from app.services.single_flight import single_flight
+from app.utils.image_urls import IMAGE_VARIANTS
+from urllib.parse import urlsplit
+from urllib.request import HTTPRedirectHandler, Request, build_opener
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import hashlib
+import asyncio
+import os
+import io
+import logging
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it originals are served as-is
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Originals larger than this are refused rather than decoded
+MAX_ORIGIN_BYTES = 20 * 1024 * 1024
+# ...and so are originals with more pixels than this, checked from the header
+# before decoding; a small compressed file can expand to gigabytes in memory
+MAX_ORIGIN_PIXELS = 40_000_000
+
+MEDIA_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+class ImageFetchError(Exception):
+    """Raised when an original image cannot be fetched or is too large to decode"""
+
+class ImageOrigin:
+    """Where original images come from, given their stored URL"""
+
+    def fetch(self, url: str) -> bytes:
+        raise NotImplementedError
+
+class _AllowedHostRedirects(HTTPRedirectHandler):
+    def __init__(self, allowed_hosts: list):
+        self.allowed_hosts = allowed_hosts
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if urlsplit(newurl).hostname not in self.allowed_hosts:
+            raise ImageFetchError(f"Redirect to a host that is not allowed: {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+class HTTPImageOrigin(ImageOrigin):
+    """Fetches originals over HTTPS, only from the allowed hosts"""
+
+    def __init__(self, allowed_hosts: list, timeout: float = 10, max_bytes: int = MAX_ORIGIN_BYTES):
+        self.allowed_hosts = allowed_hosts
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._opener = build_opener(_AllowedHostRedirects(allowed_hosts))
+
+    def fetch(self, url: str) -> bytes:
+        try:
+            with self._opener.open(Request(url, headers={"User-Agent": "boltfit-image-proxy"}),
+                                   timeout=self.timeout) as response:
+                data = response.read(self.max_bytes + 1)
+        except ImageFetchError:
+            raise
+        except Exception as e:
+            raise ImageFetchError(f"Could not fetch {url}: {e}")
+        if len(data) > self.max_bytes:
+            raise ImageFetchError(f"Image larger than {self.max_bytes} bytes: {url}")
+        return data
+
+class DirectoryImageOrigin(ImageOrigin):
+    """
+    Local stand-in for the image hosts: https://host/path is read from
+    <root>/host/path. For development and tests without network access.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def fetch(self, url: str) -> bytes:
+        parts = urlsplit(url)
+        path = (self.root / parts.hostname / parts.path.lstrip("/")).resolve()
+        if not path.is_relative_to(self.root) or not path.is_file():
+            raise ImageFetchError(f"No local copy of {url}")
+        return path.read_bytes()
+
+class DiskImageCache:
+    """
+    Rendered images on local disk, evicting the least recently used once
+    the total size passes `max_bytes`. Reads touch the file's mtime, so
+    recency survives a restart.
+
+    Workers may share the directory. Each one only counts its own writes
+    between scans, so every `rescan_bytes` written it re-reads the whole
+    directory and evicts by mtime across all workers' files: the shared
+    total stays within `max_bytes` plus `rescan_bytes` per worker.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, rescan_bytes: int = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.rescan_bytes = rescan_bytes if rescan_bytes is not None else max_bytes // 16
+        self._entries = OrderedDict()
+        self._size = 0
+        self._written = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self, rescan: bool = False):
+        """Index the files on disk, oldest use first"""
+        if self._loaded and not rescan:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries.clear()
+        self._size = 0
+        self._written = 0
+        files = []
+        for path in self.directory.iterdir():
+            if path.name.endswith(".tmp") or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Evicted by another worker while listing
+                continue
+            files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+        self._loaded = True
+        self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get(self, name: str):
+        with self._lock:
+            self._load()
+            path = self.directory / name
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except FileNotFoundError:
+                # Never rendered, or evicted by another worker sharing the directory
+                self._size -= self._entries.pop(name, 0)
+                self.misses += 1
+                return None
+            # Possibly rendered by another worker since the last scan
+            self._size += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self.hits += 1
+            return data
+
+    def put(self, name: str, data: bytes):
+        with self._lock:
+            self._load()
+            path = self.directory / name
+            # Per process, so workers rendering the same image never share a file
+            temporary = path.with_name(f"{name}.{os.getpid()}.tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, path)
+            self._size += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._written += len(data)
+            if self._written >= self.rescan_bytes:
+                # Count what the other workers have written too
+                self._load(rescan=True)
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+def output_formats() -> list:
+    """Formats this Pillow build can encode, best compression first"""
+    if Image is None:
+        return []
+    Image.init()
+    return [name for name in ("avif", "webp") if name.upper() in Image.SAVE] + ["jpeg"]
+
+def negotiate_format(accept: str, formats: list) -> str:
+    """Pick AVIF or WebP when the client's Accept header lists it, else JPEG"""
+    accept = (accept or "").lower()
+    for name in formats:
+        if name == "jpeg" or MEDIA_TYPES[name] in accept:
+            return name
+    return "jpeg"
+
+def render(data: bytes, max_side: int, image_format: str, quality: int) -> bytes:
+    """Resize an image to fit `max_side` (never upscaling) and re-encode it"""
+    with Image.open(io.BytesIO(data)) as original:
+        # Only the header has been read so far
+        width, height = original.size
+        if width * height > MAX_ORIGIN_PIXELS:
+            raise ImageFetchError(f"Image has {width}x{height} pixels, more than {MAX_ORIGIN_PIXELS}")
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if image_format == "jpeg":
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+        output = io.BytesIO()
+        options = {"quality": quality}
+        if image_format == "jpeg":
+            options.update(optimize=True, progressive=True)
+        elif image_format == "webp":
+            options["method"] = 4
+        image.save(output, format=image_format.upper(), **options)
+        return output.getvalue()
+
+class ImageProxy:
+    """
+    Serves product images resized to the named variants and re-encoded as
+    AVIF or WebP where the client accepts them. Originals come from a
+    pluggable origin; rendered copies are kept in a disk cache, and
+    concurrent requests for the same rendering share one fetch.
+    """
+
+    def __init__(self, origin: ImageOrigin, cache: DiskImageCache, allowed_hosts: list, quality: int = 80):
+        self.origin = origin
+        self.cache = cache
+        self.allowed_hosts = allowed_hosts
+        self.quality = quality
+        self.formats = output_formats()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether Pillow is installed to resize images"""
+        return Image is not None
+
+    def is_allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        return parts.scheme == "https" and (parts.hostname or "") in self.allowed_hosts
+
+    @staticmethod
+    def cache_name(url: str, variant: str, image_format: str) -> str:
+        digest = hashlib.sha256(f"{variant}\n{url}".encode("utf-8")).hexdigest()
+        return f"{digest}.{image_format}"
+
+    def _render(self, url: str, variant: str, image_format: str) -> bytes:
+        name = self.cache_name(url, variant, image_format)
+        data = self.cache.get(name)
+        if data is None:
+            data = render(self.origin.fetch(url), IMAGE_VARIANTS[variant], image_format, self.quality)
+            self.cache.put(name, data)
+        return data
+
+    async def get(self, url: str, variant: str, image_format: str) -> bytes:
+        """Rendered image bytes, from the disk cache or freshly rendered"""
+        return await single_flight.do(
+            ("image", url, variant, image_format),
+            lambda: asyncio.to_thread(self._render, url, variant, image_format)
+        )
+
+def create_origin() -> ImageOrigin:
+    if settings.IMAGE_ORIGIN_DIRECTORY:
+        return DirectoryImageOrigin(settings.IMAGE_ORIGIN_DIRECTORY)
+    return HTTPImageOrigin(settings.IMAGE_ALLOWED_HOSTS)
+
+image_proxy = ImageProxy(
+    create_origin(),
+    DiskImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES),
+    settings.IMAGE_ALLOWED_HOSTS,
+    settings.IMAGE_QUALITY
+)
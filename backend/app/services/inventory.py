@@ -0,0 +1,462 @@
+from app.config import settings
+from app.services.storage import storage, get_storage
+from app.services.storage_backend import new_document_id
+from fastapi import Depends
+from datetime import datetime
+import functools
+import weakref
+import asyncio
+import hashlib
+import secrets
+import random
+import hmac
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHARDS_COLLECTION = "inventory_shards"
+RESERVATIONS_COLLECTION = "inventory_reservations"
+
+# Upper bound on shards per SKU; more only spreads the same stock thinner
+MAX_SHARDS = 64
+
+class InsufficientStock(Exception):
+    """Raised when a reservation asks for more than is available"""
+
+    def __init__(self, shortages: list):
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for {len(shortages)} item(s)")
+
+class ReservationError(Exception):
+    """Raised when a reservation is missing or no longer in a usable state"""
+
+    def __init__(self, message: str, status: str = None):
+        self.status = status
+        super().__init__(message)
+
+class _StaleAllocation(Exception):
+    """A shard chosen from a plain read no longer holds enough stock"""
+
+def shard_id(product_id: str, size: str, shard: int) -> str:
+    # Sizes are free text; "/" is not allowed in Firestore document IDs
+    return f"{product_id}_{size.replace('/', '-')}_{shard}"
+
+def _token_hash(token: str) -> str:
+    # Only the hash is stored, so reading the reservations does not hand out release rights
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _merge_items(items: list) -> dict:
+    """Sum the quantities of repeated (product_id, size) items"""
+    merged = {}
+    for item in items:
+        key = (item["product_id"], item["size"])
+        merged[key] = merged.get(key, 0) + item["quantity"]
+    return merged
+
+class Inventory:
+    """
+    Per-(product, size) stock, kept apart from the product documents.
+    Each SKU's count is split over several shard documents so concurrent
+    checkouts write to different documents instead of queueing on one.
+    Reservations take stock out of the shards in one transaction per batch
+    and either commit (the sale) or release it; reservations not committed
+    before they expire are released by a background sweep.
+    """
+
+    def __init__(self, storage, default_shards: int = 4, reservation_ttl_seconds: float = 600,
+                 max_attempts: int = 5, expiry_interval_seconds: float = 30, max_ttl_seconds: float = 900,
+                 max_quantity: int = 20, max_reservations_per_client: int = 3):
+        self.storage = storage
+        self.default_shards = default_shards
+        self.reservation_ttl_seconds = reservation_ttl_seconds
+        self.max_ttl_seconds = max_ttl_seconds
+        self.max_quantity = max_quantity
+        self.max_reservations_per_client = max_reservations_per_client
+        self.max_attempts = max_attempts
+        self.expiry_interval_seconds = expiry_interval_seconds
+        self._expiry_task = None
+        self.reservations = 0
+        self.rejections = 0
+        self.retries = 0
+        self.expired = 0
+
+    async def _shards(self, product_id: str) -> list:
+        return await self.storage.query_documents(
+            SHARDS_COLLECTION, filters=[("product_id", "==", product_id)]
+        )
+
+    async def _seed(self, product_id: str) -> list:
+        """
+        Create shards for the product's sizes that have none, from the
+        `sizes[].stock` on the product document, and return all its shards.
+        Products predating the inventory (or sizes added since) start from
+        the stock they were created with; after that the shards are the
+        count and only `set_stock` changes it.
+        """
+        product = await self.storage.get_document("products", product_id)
+        sizes = {}
+        for entry in (product or {}).get("sizes") or []:
+            sizes.setdefault(entry["size"], entry.get("stock") or 0)
+        seeded = {shard["size"] for shard in await self._shards(product_id)}
+        missing = {size: stock for size, stock in sizes.items() if size not in seeded}
+        if missing:
+            def update(documents):
+                writes = {}
+                for size, stock in missing.items():
+                    doc_ids = [shard_id(product_id, size, shard) for shard in range(self.default_shards)]
+                    if any(documents[(SHARDS_COLLECTION, doc_id)] is not None for doc_id in doc_ids):
+                        # Seeded or set by another request meanwhile
+                        continue
+                    share, remainder = divmod(stock, self.default_shards)
+                    for shard, doc_id in enumerate(doc_ids):
+                        writes[(SHARDS_COLLECTION, doc_id)] = {
+                            "product_id": product_id, "size": size, "shard": shard,
+                            "available": share + (1 if shard < remainder else 0), "held": 0,
+                        }
+                return writes, None
+
+            refs = [
+                (SHARDS_COLLECTION, shard_id(product_id, size, shard))
+                for size in missing for shard in range(self.default_shards)
+            ]
+            await self.storage.run_transaction(refs, update)
+            logger.info(f"Inventory of {product_id} seeded for {len(missing)} size(s)")
+        return await self._shards(product_id)
+
+    async def get_stock(self, product_id: str) -> dict:
+        """Available (unreserved) stock per size"""
+        shards = await self._shards(product_id) or await self._seed(product_id)
+        stock = {}
+        for shard in shards:
+            stock[shard["size"]] = stock.get(shard["size"], 0) + shard["available"]
+        return stock
+
+    async def set_stock(self, product_id: str, size: str, quantity: int, shards: int = None) -> dict:
+        """
+        Set the stock on hand of a SKU: units held by open reservations
+        count towards `quantity`, and the rest is made available, spread
+        evenly over `shards` shard documents. Held units stay on the shards
+        they were taken from, so releasing them later gives back no more
+        than `quantity` in total.
+        """
+        shards = min(max(shards or self.default_shards, 1), MAX_SHARDS)
+        existing = [shard["id"] for shard in await self._shards(product_id) if shard["size"] == size]
+        wanted = [shard_id(product_id, size, shard) for shard in range(shards)]
+
+        def update(documents):
+            current = {doc_id: documents[(SHARDS_COLLECTION, doc_id)] for doc_id in existing + wanted}
+            held = sum((shard or {}).get("held", 0) for shard in current.values())
+            available = max(quantity - held, 0)
+            share, remainder = divmod(available, shards)
+            writes = {}
+            for doc_id in existing:
+                shard = current[doc_id]
+                if doc_id in wanted or shard is None:
+                    continue
+                # A shard dropped by re-sharding is kept until its holds are released
+                writes[(SHARDS_COLLECTION, doc_id)] = {**shard, "available": 0} if shard.get("held") else None
+            for shard, doc_id in enumerate(wanted):
+                writes[(SHARDS_COLLECTION, doc_id)] = {
+                    "product_id": product_id,
+                    "size": size,
+                    "shard": shard,
+                    "available": share + (1 if shard < remainder else 0),
+                    "held": (current[doc_id] or {}).get("held", 0),
+                }
+            return writes, (available, held)
+
+        refs = [(SHARDS_COLLECTION, doc_id) for doc_id in dict.fromkeys(existing + wanted)]
+        available, held = await self.storage.run_transaction(refs, update)
+        logger.info(f"Stock of {product_id}/{size} set to {quantity} ({held} held) over {shards} shard(s)")
+        return {"product_id": product_id, "size": size, "available": available, "held": held, "shards": shards}
+
+    @staticmethod
+    def _allocate(items: dict, shards: dict) -> dict:
+        """
+        Choose the shards to take each item from, using a plain (possibly
+        stale) read. A random shard that covers the whole quantity is
+        preferred, so one transaction touches as few documents as possible
+        and concurrent checkouts land on different shards.
+        """
+        allocations = {}
+        shortages = []
+        for (product_id, size), quantity in items.items():
+            candidates = [
+                shard for shard in shards.get(product_id, ())
+                if shard["size"] == size and shard["available"] > 0
+            ]
+            available = sum(shard["available"] for shard in candidates)
+            if available < quantity:
+                shortages.append({
+                    "product_id": product_id, "size": size,
+                    "requested": quantity, "available": available
+                })
+                continue
+            random.shuffle(candidates)
+            whole = next((shard for shard in candidates if shard["available"] >= quantity), None)
+            if whole is not None:
+                allocations[(product_id, size)] = {whole["id"]: quantity}
+                continue
+            allocation = {}
+            remaining = quantity
+            for shard in sorted(candidates, key=lambda shard: shard["available"], reverse=True):
+                taken = min(shard["available"], remaining)
+                allocation[shard["id"]] = taken
+                remaining -= taken
+                if not remaining:
+                    break
+            allocations[(product_id, size)] = allocation
+        if shortages:
+            raise InsufficientStock(shortages)
+        return allocations
+
+    @staticmethod
+    def _reserve_in_transaction(reservation_id: str, reservation: dict, allocations: dict, documents: dict):
+        writes = {}
+        for allocation in allocations.values():
+            for doc_id, amount in allocation.items():
+                shard = documents[(SHARDS_COLLECTION, doc_id)]
+                if shard is None or shard["available"] < amount:
+                    raise _StaleAllocation(doc_id)
+                writes[(SHARDS_COLLECTION, doc_id)] = {
+                    **shard, "available": shard["available"] - amount, "held": shard.get("held", 0) + amount
+                }
+        writes[(RESERVATIONS_COLLECTION, reservation_id)] = reservation
+        return writes, None
+
+    async def _check_client_limits(self, items: dict, client: str):
+        """Keep one client from holding more than its share of the stock"""
+        if sum(items.values()) > self.max_quantity:
+            raise ReservationError(f"At most {self.max_quantity} units can be reserved at once", "limit")
+        open_reservations = await self.storage.query_documents(
+            RESERVATIONS_COLLECTION, filters=[("client", "==", client), ("status", "==", "reserved")]
+        )
+        # Expired ones keep "reserved" until the sweep releases them; they no longer hold a slot
+        now = time.time()
+        held = sum(1 for reservation in open_reservations if reservation["expires_at"] > now)
+        if held >= self.max_reservations_per_client:
+            raise ReservationError("Too many open reservations; commit or release one first", "limit")
+
+    async def reserve(self, items: list, ttl_seconds: float = None, client: str = None) -> dict:
+        """
+        Reserve every item or none: [{"product_id", "size", "quantity"}].
+        Raises InsufficientStock listing the short items. A `client` (the
+        customer's address) is held to the per-client limits. The returned
+        `release_token` is the customer's proof of ownership: only its holder
+        or the backend can release the reservation.
+        """
+        items = _merge_items(items)
+        ttl_seconds = min(ttl_seconds or self.reservation_ttl_seconds, self.max_ttl_seconds)
+        if client is not None:
+            try:
+                await self._check_client_limits(items, client)
+            except ReservationError:
+                self.rejections += 1
+                raise
+        product_ids = list(dict.fromkeys(product_id for product_id, _ in items))
+
+        for attempt in range(self.max_attempts):
+            results = await asyncio.gather(*(self._shards(product_id) for product_id in product_ids))
+            # SKUs without shards yet start from the product's own stock
+            seeded = dict(zip(product_ids, ({shard["size"] for shard in result} for result in results)))
+            unseeded = list(dict.fromkeys(
+                product_id for product_id, size in items if size not in seeded[product_id]
+            ))
+            if unseeded:
+                seeds = dict(zip(unseeded, await asyncio.gather(*(self._seed(product_id) for product_id in unseeded))))
+                results = [seeds.get(product_id, result) for product_id, result in zip(product_ids, results)]
+            try:
+                allocations = self._allocate(items, dict(zip(product_ids, results)))
+            except InsufficientStock:
+                self.rejections += 1
+                raise
+
+            reservation_id = new_document_id()
+            release_token = secrets.token_urlsafe(24)
+            reservation = {
+                "status": "reserved",
+                "items": [
+                    {"product_id": product_id, "size": size, "quantity": items[(product_id, size)],
+                     "allocations": allocation}
+                    for (product_id, size), allocation in allocations.items()
+                ],
+                # Epoch seconds, comparable the same way in every backend
+                "expires_at": time.time() + ttl_seconds,
+                "client": client,
+                "release_token_hash": _token_hash(release_token),
+                "created_at": datetime.utcnow(),
+            }
+            refs = [
+                (SHARDS_COLLECTION, doc_id)
+                for allocation in allocations.values() for doc_id in allocation
+            ]
+            try:
+                await self.storage.run_transaction(
+                    refs, functools.partial(self._reserve_in_transaction, reservation_id, reservation, allocations)
+                )
+            except _StaleAllocation:
+                # Another checkout drained a chosen shard since the plain read
+                self.retries += 1
+                continue
+            self.reservations += 1
+            return {"id": reservation_id, **reservation, "release_token": release_token}
+
+        self.rejections += 1
+        raise ReservationError("Stock is changing too quickly; try again", "contended")
+
+    async def _get_reservation(self, reservation_id: str) -> dict:
+        reservation = await self.storage.get_document(RESERVATIONS_COLLECTION, reservation_id)
+        if reservation is None:
+            raise ReservationError("Reservation not found", "missing")
+        return reservation
+
+    async def commit(self, reservation_id: str) -> dict:
+        """Turn a reservation into a sale. Its stock stays taken for good"""
+        reservation = await self._get_reservation(reservation_id)
+        shard_refs = [
+            (SHARDS_COLLECTION, doc_id)
+            for item in reservation["items"] for doc_id in item["allocations"]
+        ]
+
+        def update(documents):
+            reservation = documents[(RESERVATIONS_COLLECTION, reservation_id)]
+            if reservation["status"] != "reserved":
+                raise ReservationError(f"Reservation is {reservation['status']}", reservation["status"])
+            if reservation["expires_at"] <= time.time():
+                raise ReservationError("Reservation has expired", "expired")
+            # The sold units are no longer held; only the shards the reservation used are written
+            writes = {}
+            for item in reservation["items"]:
+                for doc_id, amount in item["allocations"].items():
+                    ref = (SHARDS_COLLECTION, doc_id)
+                    shard = writes.get(ref) or documents[ref]
+                    if shard is not None:
+                        writes[ref] = {**shard, "held": max(shard.get("held", 0) - amount, 0)}
+            reservation = {**reservation, "status": "committed", "committed_at": datetime.utcnow()}
+            writes[(RESERVATIONS_COLLECTION, reservation_id)] = reservation
+            return writes, reservation
+
+        reservation = await self.storage.run_transaction(
+            [(RESERVATIONS_COLLECTION, reservation_id)] + list(dict.fromkeys(shard_refs)), update
+        )
+        return {"id": reservation_id, **reservation}
+
+    async def release(self, reservation_id: str, status: str = "released", release_token: str = None) -> dict:
+        """
+        Return a reservation's stock to the shards it was taken from. With a
+        `release_token`, only the reservation it was issued for can be released.
+        """
+        reservation = await self._get_reservation(reservation_id)
+        if release_token is not None and not hmac.compare_digest(
+            _token_hash(release_token), reservation.get("release_token_hash") or ""
+        ):
+            # Indistinguishable from a missing one, so ids cannot be probed
+            raise ReservationError("Reservation not found", "missing")
+        shard_refs = [
+            (SHARDS_COLLECTION, doc_id)
+            for item in reservation["items"] for doc_id in item["allocations"]
+        ]
+
+        def update(documents):
+            current = documents[(RESERVATIONS_COLLECTION, reservation_id)]
+            if current["status"] != "reserved":
+                raise ReservationError(f"Reservation is {current['status']}", current["status"])
+            writes = {}
+            for item in current["items"]:
+                for doc_id, amount in item["allocations"].items():
+                    ref = (SHARDS_COLLECTION, doc_id)
+                    shard = writes.get(ref) or documents[ref]
+                    if shard is None:
+                        # The SKU was re-sharded meanwhile; bring the shard back
+                        shard = {"product_id": item["product_id"], "size": item["size"],
+                                 "shard": int(doc_id.rsplit("_", 1)[1]), "available": 0, "held": 0}
+                    writes[ref] = {
+                        **shard, "available": shard["available"] + amount,
+                        "held": max(shard.get("held", 0) - amount, 0)
+                    }
+            current = {**current, "status": status, "released_at": datetime.utcnow()}
+            writes[(RESERVATIONS_COLLECTION, reservation_id)] = current
+            return writes, current
+
+        current = await self.storage.run_transaction(
+            [(RESERVATIONS_COLLECTION, reservation_id)] + list(dict.fromkeys(shard_refs)), update
+        )
+        return {"id": reservation_id, **current}
+
+    async def release_expired(self, limit: int = 100) -> int:
+        """Release reservations past their expiry; returns how many were released"""
+        expired = await self.storage.query_documents(
+            RESERVATIONS_COLLECTION,
+            filters=[("status", "==", "reserved"), ("expires_at", "<=", time.time())],
+            limit=limit
+        )
+        released = 0
+        for reservation in expired:
+            try:
+                await self.release(reservation["id"], status="expired")
+                released += 1
+            except ReservationError:
+                # Committed or released while the sweep was running
+                pass
+        self.expired += released
+        if released:
+            logger.info(f"Released {released} expired inventory reservation(s)")
+        return released
+
+    def start_expiry(self):
+        """Release expired reservations every `expiry_interval_seconds` from a background task"""
+        if self._expiry_task is not None:
+            return
+        self._expiry_task = asyncio.get_running_loop().create_task(self._release_expired())
+
+    async def stop_expiry(self):
+        if self._expiry_task is not None:
+            self._expiry_task.cancel()
+            self._expiry_task = None
+
+    async def _release_expired(self):
+        while True:
+            await asyncio.sleep(self.expiry_interval_seconds)
+            try:
+                await self.release_expired()
+            except Exception as e:
+                logger.error(f"Releasing expired reservations failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "reservations": self.reservations,
+            "rejections": self.rejections,
+            "retries": self.retries,
+            "expired": self.expired,
+        }
+
+inventory = Inventory(
+    storage,
+    default_shards=settings.INVENTORY_SHARDS,
+    reservation_ttl_seconds=settings.INVENTORY_RESERVATION_TTL_SECONDS,
+    expiry_interval_seconds=settings.INVENTORY_EXPIRY_INTERVAL_SECONDS,
+    max_ttl_seconds=settings.INVENTORY_MAX_TTL_SECONDS,
+    max_quantity=settings.INVENTORY_MAX_QUANTITY,
+    max_reservations_per_client=settings.INVENTORY_MAX_RESERVATIONS_PER_CLIENT
+)
+
+# Inventories over storages that replace the default one through dependency overrides
+_override_inventories = weakref.WeakKeyDictionary()
+
+def get_inventory(storage = Depends(get_storage)) -> Inventory:
+    """FastAPI dependency for the inventory over the storage routes use"""
+    if storage is inventory.storage:
+        return inventory
+    service = _override_inventories.get(storage)
+    if service is None:
+        service = _override_inventories[storage] = Inventory(
+            storage,
+            default_shards=settings.INVENTORY_SHARDS,
+            reservation_ttl_seconds=settings.INVENTORY_RESERVATION_TTL_SECONDS,
+            expiry_interval_seconds=settings.INVENTORY_EXPIRY_INTERVAL_SECONDS,
+            max_ttl_seconds=settings.INVENTORY_MAX_TTL_SECONDS,
+            max_quantity=settings.INVENTORY_MAX_QUANTITY,
+            max_reservations_per_client=settings.INVENTORY_MAX_RESERVATIONS_PER_CLIENT
+        )
+    return service
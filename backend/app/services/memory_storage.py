@@ -0,0 +1,129 @@
+from app.services.storage_backend import LocalStorage, matches, project, new_document_id
+import threading
+import copy
+
+class MemoryStorage(LocalStorage):
+    """
+    Storage backend holding every collection in process memory. Nothing is
+    persisted; meant for local development, load tests and benchmarks.
+    """
+
+    blocking = False
+
+    def __init__(self, collections: dict = None):
+        super().__init__()
+        self._collections = {}
+        self._lock = threading.RLock()
+        for collection_name, documents in (collections or {}).items():
+            for document in documents:
+                document = dict(document)
+                doc_id = document.pop("id", None) or new_document_id()
+                self._collection(collection_name)[doc_id] = copy.deepcopy(document)
+
+    def _collection(self, collection_name: str) -> dict:
+        return self._collections.setdefault(collection_name, {})
+
+    def create_document(self, collection_name: str, data: dict) -> dict:
+        doc_id = new_document_id()
+        with self._lock:
+            self._collection(collection_name)[doc_id] = copy.deepcopy(data)
+        document = {"id": doc_id, **data}
+        self.notify(collection_name, [("added", doc_id, document)])
+        return document
+
+    def get_documents(self, collection_name: str, doc_ids: list) -> dict:
+        with self._lock:
+            collection = self._collection(collection_name)
+            return {
+                doc_id: {"id": doc_id, **collection[doc_id]}
+                for doc_id in dict.fromkeys(doc_ids)
+                if doc_id in collection
+            }
+
+    def _select(self, collection_name: str, filters: list = None, order_by: str = None,
+                descending: bool = False) -> list:
+        with self._lock:
+            documents = [
+                {"id": doc_id, **data}
+                for doc_id, data in self._collection(collection_name).items()
+            ]
+        documents = [document for document in documents if matches(document, filters)]
+        if order_by:
+            # Like Firestore, ordering by a field leaves out documents without it
+            documents = [document for document in documents if document.get(order_by) is not None]
+            documents.sort(key=lambda document: (document[order_by], document["id"]), reverse=descending)
+        else:
+            documents.sort(key=lambda document: document["id"])
+        return documents
+
+    def query_documents(self, collection_name: str, filters: list = None, order_by: str = None,
+                        descending: bool = False, limit: int = None, offset: int = None,
+                        start_after: str = None, select: list = None) -> list:
+        documents = self._select(collection_name, filters, order_by, descending)
+        # A cursor that is gone (deleted, or no longer matching) falls back to the offset
+        start = offset or 0
+        if start_after:
+            for position, document in enumerate(documents):
+                if document["id"] == start_after:
+                    start = position + 1
+                    break
+        end = start + limit if limit else None
+        return [project(document, select) for document in documents[start:end]]
+
+    def count_documents(self, collection_name: str, filters: list = None) -> int:
+        return len(self._select(collection_name, filters))
+
+    def patch_document(self, collection_name: str, doc_id: str, data: dict, base: dict = None):
+        with self._lock:
+            collection = self._collection(collection_name)
+            if doc_id not in collection:
+                return None
+            collection[doc_id].update(copy.deepcopy(data))
+            document = {"id": doc_id, **collection[doc_id]}
+        self.notify(collection_name, [("modified", doc_id, document)])
+        return document
+
+    def delete_document(self, collection_name: str, doc_id: str, must_exist: bool = False):
+        with self._lock:
+            existed = self._collection(collection_name).pop(doc_id, None) is not None
+        if existed:
+            self.notify(collection_name, [("removed", doc_id, None)])
+        return existed or not must_exist
+
+    def bulk_write(self, collection_name: str, operations: list) -> list:
+        results = []
+        events = []
+        with self._lock:
+            collection = self._collection(collection_name)
+            for op, doc_id, data in operations:
+                if op == "create":
+                    doc_id = new_document_id()
+                    collection[doc_id] = copy.deepcopy(data)
+                    document = {"id": doc_id, **data}
+                    results.append({"id": doc_id, "status": "created", "document": document})
+                    events.append(("added", doc_id, document))
+                elif doc_id in collection:
+                    collection[doc_id].update(copy.deepcopy(data))
+                    document = {"id": doc_id, **collection[doc_id]}
+                    results.append({"id": doc_id, "status": "updated", "document": document})
+                    events.append(("modified", doc_id, document))
+                else:
+                    results.append({"id": doc_id, "status": "failed", "error": "Document not found"})
+        self.notify(collection_name, events)
+        return results
+
+    def run_transaction(self, refs: list, update):
+        with self._lock:
+            documents = {
+                (collection_name, doc_id): copy.deepcopy(self._collection(collection_name).get(doc_id))
+                for collection_name, doc_id in refs
+            }
+            writes, result = update(documents)
+            for (collection_name, doc_id), data in writes.items():
+                collection = self._collection(collection_name)
+                if data is None:
+                    collection.pop(doc_id, None)
+                else:
+                    collection[doc_id] = copy.deepcopy(data)
+        self._notify_writes(documents, writes)
+        return result
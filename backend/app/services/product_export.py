@@ -0,0 +1,99 @@
+from app.services.storage_backend import matches
+from app.utils.json_documents import encode_value
+from datetime import datetime, timezone
+import orjson
+import csv
+import io
+
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Same columns the CSV import reads, so an export can be edited and re-imported.
+# Sizes and colors are JSON arrays, so stock and hex codes survive the round trip
+CSV_COLUMNS = (
+    "id", "name", "description", "price", "original_price", "category", "material", "brand",
+    "sizes", "colors", "image_urls", "is_featured", "is_active", "created_at", "updated_at",
+)
+
+# Documents encoded per chunk sent to the client
+EXPORT_CHUNK_SIZE = 500
+
+def export_query(is_active: bool = None, category: str = None, is_featured: bool = None,
+                 since: datetime = None) -> tuple:
+    """
+    Split export filters into (server filters, order_by, local filters).
+    An incremental export is an `updated_at` range in update order; the
+    equality filters are then checked as documents stream past, so
+    Firestore needs no extra composite index for it.
+    """
+    filters = []
+    if is_active is not None:
+        filters.append(("is_active", "==", is_active))
+    if category:
+        filters.append(("category", "==", category))
+    if is_featured is not None:
+        filters.append(("is_featured", "==", is_featured))
+    if since is None:
+        return filters, None, []
+    if since.tzinfo is not None:
+        # Timestamps are written as naive UTC (Firestore reads those as UTC too)
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return [("updated_at", ">=", since)], "updated_at", filters
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+def csv_row(product: dict) -> list:
+    row = {
+        **product,
+        "sizes": orjson.dumps(product.get("sizes") or []).decode("utf-8"),
+        "colors": orjson.dumps(product.get("colors") or []).decode("utf-8"),
+        "image_urls": "|".join(product.get("images") or []),
+    }
+    return [_csv_value(row.get(column)) for column in CSV_COLUMNS]
+
+async def export_products(storage, export_format: str, is_active: bool = None, category: str = None,
+                          is_featured: bool = None, since: datetime = None,
+                          chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Stream products as NDJSON or CSV. Documents are pulled from storage in
+    chunks and encoded as they arrive, so memory stays flat however large
+    the catalog is.
+    """
+    filters, order_by, local_filters = export_query(is_active, category, is_featured, since)
+    documents = storage.stream_documents("products", filters, order_by, chunk_size=chunk_size)
+    try:
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_COLUMNS)
+            rows = 0
+            async for product in documents:
+                if not matches(product, local_filters):
+                    continue
+                writer.writerow(csv_row(product))
+                rows += 1
+                if rows % chunk_size == 0:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode("utf-8")
+            return
+
+        lines = []
+        async for product in documents:
+            if not matches(product, local_filters):
+                continue
+            lines.append(orjson.dumps(product, default=encode_value, option=orjson.OPT_APPEND_NEWLINE))
+            if len(lines) >= chunk_size:
+                yield b"".join(lines)
+                lines = []
+        if lines:
+            yield b"".join(lines)
+    finally:
+        # A client that disconnects mid-export must not leave the storage stream open
+        await documents.aclose()
@@ -0,0 +1,192 @@
+from app.models.product import ProductCreate, ProductUpdate, ProductCreateForm, ProductUpdateForm
+from pydantic import ValidationError
+from datetime import datetime
+import logging
+import json
+import csv
+import io
+
+logger = logging.getLogger(__name__)
+
+# Firestore accepts at most 500 writes per batch
+BULK_CHUNK_SIZE = 500
+
+JSON_TYPES = {"application/json"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_TYPES = {"text/csv", "application/csv"}
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in error.errors()
+    )
+
+def _parse_image_urls(value):
+    """CSV cells hold image URLs as a JSON array or a |-separated list"""
+    if value is None or isinstance(value, list):
+        return value
+    value = value.strip()
+    if not value:
+        return []
+    if value.startswith("["):
+        return json.loads(value)
+    return [url.strip() for url in value.split("|") if url.strip()]
+
+def _parse_structured_cell(record: dict, key: str):
+    """
+    Sizes and colors cells may hold the JSON array an export writes, which
+    keeps stock and hex codes; anything else is left to the comma-separated
+    form parsing
+    """
+    value = record.get(key)
+    if not isinstance(value, str) or not value.strip().startswith("["):
+        return None
+    del record[key]
+    return json.loads(value)
+
+def _csv_record(record: dict) -> dict:
+    """Empty CSV cells mean "not provided"; booleans arrive as text"""
+    cleaned = {}
+    for key, value in record.items():
+        if key is None or value is None:
+            continue
+        value = value.strip()
+        if value == "":
+            continue
+        if key in ("is_featured", "is_active"):
+            value = value.lower() in ("true", "1", "yes")
+        cleaned[key] = value
+    return cleaned
+
+def build_operation(record: dict, admin_email: str, from_csv: bool = False) -> tuple:
+    """
+    Validate one import row and turn it into a bulk_write operation.
+    Rows with an `id` update that product, all others create one.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Row must be an object")
+
+    record = dict(record)
+    doc_id = record.pop("id", None)
+    now = datetime.utcnow()
+
+    if from_csv:
+        images = _parse_image_urls(record.pop("image_urls", record.pop("images", None)))
+        structured = {}
+        for key in ("sizes", "colors"):
+            value = _parse_structured_cell(record, key)
+            if value is not None:
+                structured[key] = value
+        if doc_id:
+            model = ProductUpdateForm(**record).to_product_update(images)
+            if structured:
+                model = ProductUpdate(**{**model.model_dump(), **structured})
+        else:
+            model = ProductCreateForm(**record).to_product_create(images)
+            if structured:
+                model = ProductCreate(**{**model.model_dump(), **structured})
+    elif doc_id:
+        model = ProductUpdate(**record)
+    else:
+        model = ProductCreate(**record)
+
+    if doc_id:
+        data = {key: value for key, value in model.model_dump().items() if value is not None}
+        data["updated_at"] = now
+        data["updated_by"] = admin_email
+        return ("update", str(doc_id), data)
+
+    data = model.model_dump()
+    data["created_at"] = now
+    data["updated_at"] = now
+    data["created_by"] = admin_email
+    return ("create", None, data)
+
+async def iter_import_rows(content_type: str, request):
+    """
+    Yield (row_number, record, from_csv) from a JSON array, NDJSON or CSV body.
+    NDJSON is consumed line by line as it streams in.
+    """
+    if content_type in NDJSON_TYPES:
+        row_number = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    row_number += 1
+                    yield row_number, line, False
+        if buffer.strip():
+            yield row_number + 1, buffer, False
+        return
+
+    body = await request.body()
+    if content_type in JSON_TYPES:
+        records = json.loads(body)
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array of products")
+        for row_number, record in enumerate(records, start=1):
+            yield row_number, record, False
+    elif content_type in CSV_TYPES:
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        for row_number, record in enumerate(reader, start=1):
+            yield row_number, _csv_record(record), True
+    else:
+        raise ValueError(f"Unsupported content type: {content_type or 'none'}")
+
+class ProductImporter:
+    """Collects validated rows and commits them to storage in batches"""
+
+    def __init__(self, admin_email: str, storage, catalog_cache, chunk_size: int = BULK_CHUNK_SIZE):
+        self.admin_email = admin_email
+        self.storage = storage
+        self.catalog_cache = catalog_cache
+        self.chunk_size = chunk_size
+        self.results = []
+        self._pending = []
+
+    async def add(self, row_number: int, record, from_csv: bool = False):
+        """Validate one row and queue it, committing when a batch is full"""
+        try:
+            if isinstance(record, (bytes, str)):
+                record = json.loads(record)
+            operation = build_operation(record, self.admin_email, from_csv)
+        except ValidationError as e:
+            self.results.append({"row": row_number, "status": "invalid", "error": _validation_message(e)})
+            return
+        except ValueError as e:
+            self.results.append({"row": row_number, "status": "invalid", "error": str(e)})
+            return
+
+        self._pending.append((row_number, operation))
+        if len(self._pending) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        """Commit queued rows as one batch and record a result per row"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            outcomes = await self.storage.bulk_write(
+                "products", [operation for _, operation in pending]
+            )
+        except Exception as e:
+            logger.error(f"Bulk import batch failed: {e}")
+            for row_number, (_, doc_id, _) in pending:
+                self.results.append({"row": row_number, "id": doc_id, "status": "failed", "error": str(e)})
+            return
+
+        for (row_number, _), outcome in zip(pending, outcomes):
+            document = outcome.pop("document", None)
+            if document:
+                self.catalog_cache.put(document)
+            self.results.append({"row": row_number, **outcome})
+
+    def summary(self) -> dict:
+        self.results.sort(key=lambda result: result["row"])
+        counts = {"created": 0, "updated": 0, "invalid": 0, "failed": 0}
+        for result in self.results:
+            counts[result["status"]] += 1
+        return {"total": len(self.results), **counts, "results": self.results}
@@ -0,0 +1,115 @@
+from datetime import datetime
+from bisect import bisect_left, bisect_right, insort
+from typing import Optional
+import math
+
+ANY = None
+
+def sort_key(product: dict) -> tuple:
+    """
+    Newest-first ordering key. Products without created_at sort first,
+    matching the old `x.get("created_at", datetime.now())` behaviour.
+    """
+    created_at = product.get("created_at")
+    if isinstance(created_at, datetime):
+        timestamp = created_at.timestamp()
+    else:
+        timestamp = math.inf
+    return (-timestamp, product["id"])
+
+def matches_filters(product: dict, is_active: bool, category: str = ANY,
+                    is_featured: bool = ANY) -> bool:
+    """Whether a product passes the list filters the products route accepts"""
+    if product.get("is_active") != is_active:
+        return False
+    if category and product.get("category") != category:
+        return False
+    if is_featured is not None and product.get("is_featured") != is_featured:
+        return False
+    return True
+
+class ProductIndex:
+    """
+    Secondary index over the product list.
+
+    Every product is filed under the buckets for its exact
+    (category, is_active, is_featured) combination and for the
+    "any category" / "any featured" wildcards, so each filter the
+    products route accepts maps to exactly one bucket. Buckets hold
+    sort keys in newest-first order, which turns a page request into
+    a bucket lookup plus a slice.
+    """
+
+    def __init__(self, products: list = None):
+        self._buckets = {}
+        self._products = {}
+        self._keys = {}
+        for product in products or []:
+            self.add(product)
+
+    @staticmethod
+    def _bucket_ids(product: dict) -> list:
+        category = product.get("category")
+        is_active = product.get("is_active")
+        is_featured = product.get("is_featured")
+        # dict.fromkeys drops duplicates when a field itself is missing
+        return list(dict.fromkeys([
+            (category, is_active, is_featured),
+            (category, is_active, ANY),
+            (ANY, is_active, is_featured),
+            (ANY, is_active, ANY),
+        ]))
+
+    def __len__(self):
+        return len(self._products)
+
+    def add(self, product: dict):
+        """Insert or replace a single product"""
+        product_id = product["id"]
+        if product_id in self._products:
+            self.remove(product_id)
+        key = sort_key(product)
+        self._products[product_id] = product
+        self._keys[product_id] = key
+        for bucket_id in self._bucket_ids(product):
+            insort(self._buckets.setdefault(bucket_id, []), key)
+
+    def remove(self, product_id: str):
+        """Remove a single product, if present"""
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        key = self._keys.pop(product_id)
+        for bucket_id in self._bucket_ids(product):
+            bucket = self._buckets.get(bucket_id)
+            if not bucket:
+                continue
+            position = bisect_left(bucket, key)
+            if position < len(bucket) and bucket[position] == key:
+                del bucket[position]
+            if not bucket:
+                del self._buckets[bucket_id]
+
+    def get(self, product_id: str) -> Optional[dict]:
+        return self._products.get(product_id)
+
+    def all(self) -> list:
+        return list(self._products.values())
+
+    def count(self, is_active: bool, category: str = ANY, is_featured: bool = ANY) -> int:
+        """Number of products matching the filters"""
+        return len(self._buckets.get((category, is_active, is_featured), ()))
+
+    def position_after(self, product_id: str, is_active: bool, category: str = ANY,
+                       is_featured: bool = ANY) -> Optional[int]:
+        """Offset of the first product after `product_id` in a bucket (cursor pagination)"""
+        key = self._keys.get(product_id)
+        if key is None:
+            return None
+        return bisect_right(self._buckets.get((category, is_active, is_featured), ()), key)
+
+    def page(self, is_active: bool, category: str = ANY, is_featured: bool = ANY,
+             offset: int = 0, limit: int = 10) -> list:
+        """Products matching the filters, newest first, sliced to one page"""
+        bucket = self._buckets.get((category, is_active, is_featured), ())
+        return [self._products[key[1]] for key in bucket[offset:offset + limit]]
@@ -0,0 +1,137 @@
+from app.models.product import ProductResponse
+from app.utils.metrics import request_metrics
+from app.utils.image_urls import image_variants
+from pydantic import TypeAdapter
+from collections import OrderedDict
+import threading
+import orjson
+
+# Fields a product grid card needs; `images` is cut down to the first one
+CARD_FIELDS = ("id", "name", "price", "original_price", "category", "images", "image_variants")
+CARD_PROJECTION = (CARD_FIELDS, 1)
+
+_FIELD_ADAPTERS = {
+    name: (TypeAdapter(field.annotation), field)
+    for name, field in ProductResponse.model_fields.items()
+}
+
+# Fields derived from stored ones rather than stored themselves
+COMPUTED_FIELDS = {"image_variants": "images"}
+
+def stored_fields(fields: tuple) -> list:
+    """The stored fields a projection reads, for field masks"""
+    return list(dict.fromkeys(COMPUTED_FIELDS.get(name, name) for name in fields))
+
+def parse_fields(view: str = None, fields: str = None):
+    """
+    Resolve `view=card|full` / `fields=a,b,c` into a (fields, max_images)
+    projection, or None for the full product. Raises ValueError for
+    unknown fields.
+    """
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in _FIELD_ADAPTERS and name not in COMPUTED_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return (tuple(dict.fromkeys(["id", *requested])), None)
+    if view == "card":
+        return CARD_PROJECTION
+    return None
+
+def _project(product: dict, fields: tuple, max_images: int = None) -> dict:
+    """Validate and JSON-encode just the requested fields of a product"""
+    projected = {}
+    for name in fields:
+        if name == "image_variants":
+            images = product.get("images") or []
+            projected[name] = image_variants(images[:max_images] if max_images is not None else images)
+            continue
+        adapter, field = _FIELD_ADAPTERS[name]
+        if name in product:
+            value = adapter.validate_python(product[name])
+        else:
+            value = field.get_default(call_default_factory=True)
+        if name == "images" and max_images is not None:
+            value = value[:max_images]
+        projected[name] = adapter.dump_python(value, mode="json")
+    return projected
+
+class ProductSerializer:
+    """
+    Cache of per-product JSON bytes.
+
+    Each stored product version is validated through ProductResponse once,
+    then reused verbatim, so list pages are assembled by joining bytes
+    instead of constructing and re-serializing hundreds of models. Entries
+    are keyed by (id, updated_at) and the catalog cache discards a product's
+    entry whenever it sees the product change (a write here, a listener
+    event or a reload), so edits that leave updated_at alone are picked up
+    too. Field projections (card view, `fields=`) are cached alongside the
+    full rendering.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Entries are discarded from the Firestore listener thread too
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def to_json(self, product: dict, projection: tuple = None) -> bytes:
+        """JSON bytes for a product, exactly as ProductResponse would render it"""
+        product_id = product["id"]
+        version = product.get("updated_at")
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is None or entry[0] != version:
+                entry = self._entries[product_id] = (version, {})
+            self._entries.move_to_end(product_id)
+
+        renderings = entry[1]
+        body = renderings.get(projection)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        self.misses += 1
+        with request_metrics.span("serialize", "product"):
+            if projection is None:
+                body = orjson.dumps(ProductResponse(**product).model_dump(mode="json"))
+            else:
+                body = orjson.dumps(_project(product, *projection))
+        renderings[projection] = body
+        with self._lock:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def discard(self, product_id: str):
+        """Forget a product after it has been written, deleted or changed elsewhere"""
+        with self._lock:
+            self._entries.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+def products_array(products: list, projection: tuple = None) -> bytes:
+    """JSON array of products assembled from cached product bytes"""
+    return b"[" + b",".join(product_serializer.to_json(product, projection) for product in products) + b"]"
+
+def products_json(products: list, projection: tuple = None, **fields) -> bytes:
+    """
+    Assemble {"products": [...], **fields} from cached product bytes,
+    keeping the field order of the list response models
+    """
+    body = b'{"products":' + products_array(products, projection)
+    if fields:
+        body += b"," + orjson.dumps(fields)[1:]
+    else:
+        body += b"}"
+    return body
+
+product_serializer = ProductSerializer()
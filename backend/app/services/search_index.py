@@ -0,0 +1,148 @@
+from app.services.product_index import sort_key
+from bisect import bisect_left, insort
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# How much a match in each field counts towards relevance
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "category": 2.0,
+    "material": 1.5,
+    "colors": 1.5,
+    "description": 1.0,
+}
+
+# A prefix match ("shi" -> "shirt") counts less than a whole-word match
+PREFIX_MATCH_FACTOR = 0.5
+
+def tokenize(text) -> list:
+    """Split text into lowercase word tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+def _product_fields(product: dict) -> dict:
+    colors = product.get("colors") or []
+    color_names = " ".join(
+        color.get("name", "") if isinstance(color, dict) else str(color)
+        for color in colors
+    )
+    return {
+        "name": product.get("name"),
+        "category": product.get("category"),
+        "material": product.get("material"),
+        "colors": color_names,
+        "description": product.get("description"),
+    }
+
+class SearchIndex:
+    """
+    Inverted index for full-text product search.
+
+    Maps each token to the products containing it with a field-weighted
+    score. The vocabulary is kept sorted, so prefix matching for
+    search-as-you-type is a bisect plus a walk over the matching tokens
+    rather than a scan of every product's text.
+    """
+
+    def __init__(self, products: list = None):
+        self._postings = {}
+        self._vocabulary = []
+        self._product_tokens = {}
+        for product in products or []:
+            self.add(product)
+
+    def __len__(self):
+        return len(self._product_tokens)
+
+    def add(self, product: dict):
+        """Index or re-index a single product"""
+        product_id = product["id"]
+        if product_id in self._product_tokens:
+            self.remove(product_id)
+
+        weights = {}
+        for field, text in _product_fields(product).items():
+            field_weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0.0) + field_weight
+
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                insort(self._vocabulary, token)
+            posting[product_id] = weight
+        self._product_tokens[product_id] = list(weights)
+
+    def remove(self, product_id: str):
+        """Remove a single product from the index, if present"""
+        for token in self._product_tokens.pop(product_id, []):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(product_id, None)
+            if not posting:
+                del self._postings[token]
+                position = bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+
+    def _match(self, query_token: str) -> dict:
+        """Scores for one query token: whole-word matches plus prefix matches"""
+        scores = dict(self._postings.get(query_token, {}))
+        position = bisect_left(self._vocabulary, query_token)
+        vocabulary = self._vocabulary
+        while position < len(vocabulary) and vocabulary[position].startswith(query_token):
+            token = vocabulary[position]
+            position += 1
+            if token == query_token:
+                continue
+            for product_id, weight in self._postings[token].items():
+                score = weight * PREFIX_MATCH_FACTOR
+                if score > scores.get(product_id, 0.0):
+                    scores[product_id] = score
+        return scores
+
+    def search(self, text: str) -> dict:
+        """
+        Find products matching every token of `text`, each of which may be
+        a partial word. Returns {product_id: relevance score}.
+        """
+        query_tokens = list(dict.fromkeys(tokenize(text)))
+        if not query_tokens:
+            return {}
+
+        results = None
+        # Start from the rarest token so the intersection stays small
+        for scores in sorted((self._match(token) for token in query_tokens), key=len):
+            if results is None:
+                results = scores
+            else:
+                results = {
+                    product_id: score + scores[product_id]
+                    for product_id, score in results.items()
+                    if product_id in scores
+                }
+            if not results:
+                return {}
+        return results
+
+def rank(scores: dict, products) -> list:
+    """Order matching products by relevance, newest first on ties"""
+    matched = [product for product in products if product["id"] in scores]
+    matched.sort(key=lambda product: (-scores[product["id"]],) + sort_key(product))
+    return matched
+
+def ranked_page(ranked: list, offset: int, limit: int, start_after: str = None) -> list:
+    """
+    One page of ranked results: the `limit` products after the one with ID
+    `start_after`, or from `offset` when there is no such product
+    """
+    if start_after:
+        for position, product in enumerate(ranked):
+            if product["id"] == start_after:
+                offset = position + 1
+                break
+    return ranked[offset:offset + limit]
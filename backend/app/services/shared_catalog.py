@@ -0,0 +1,165 @@
+from app.utils.json_documents import encode_value, decode_document
+import orjson
+import struct
+import mmap
+import glob
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BFCAT001"
+# Header layout: magic, sequence (seqlock), then the published fields, then
+# the refresh-request counter, which followers write and the leader reads
+SEQUENCE = struct.Struct("<Q")
+BODY = struct.Struct("<QddQ")  # version, published_at, heartbeat, count
+SEQUENCE_OFFSET = 8
+BODY_OFFSET = 16
+REQUESTS_OFFSET = BODY_OFFSET + BODY.size
+HEADER_SIZE = REQUESTS_OFFSET + SEQUENCE.size
+
+class SharedCatalog:
+    """
+    Catalog shared by every worker on a host through memory-mapped files,
+    ideally on tmpfs (/dev/shm). One worker, the leader elected with an
+    exclusive file lock, loads the catalog from Firestore and publishes it;
+    the others map it read-only and parse it straight from the shared
+    pages. A version counter in a small mapped header, guarded by a
+    sequence lock, lets readers spot a new catalog without taking a lock.
+
+    Each publish is a new immutable data file, <path>.<version>, so a
+    reader never sees a half-written catalog.
+    """
+
+    def __init__(self, path: str, stale_after_seconds: float = 10.0):
+        self.path = path
+        self.stale_after_seconds = stale_after_seconds
+        self.is_leader = False
+        self._header = None
+        self._lock_file = None
+
+    def _make_directory(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _open(self) -> mmap.mmap:
+        if self._header is None:
+            self._make_directory()
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < HEADER_SIZE:
+                    # Zero-filled until the first publish, which reads as "nothing yet"
+                    os.ftruncate(fd, HEADER_SIZE)
+                self._header = mmap.mmap(fd, HEADER_SIZE)
+            finally:
+                os.close(fd)
+        return self._header
+
+    def try_lead(self) -> bool:
+        """Become the leader if no other worker holds the lock. Returns whether this worker leads"""
+        if self.is_leader:
+            return True
+        import fcntl
+
+        if self._lock_file is None:
+            # Leadership is usually decided before anything maps the header
+            self._make_directory()
+            self._lock_file = open(self.path + ".lock", "a+")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        self.is_leader = True
+        logger.info(f"Shared catalog: this worker (pid {os.getpid()}) is now the leader")
+        return True
+
+    def header(self):
+        """The published version, times and count, or None before the first publish"""
+        view = self._open()
+        for _ in range(100):
+            sequence = SEQUENCE.unpack_from(view, SEQUENCE_OFFSET)[0]
+            if sequence % 2:
+                # The leader is mid-write
+                continue
+            magic = view[:len(MAGIC)]
+            version, published_at, heartbeat, count = BODY.unpack_from(view, BODY_OFFSET)
+            if SEQUENCE.unpack_from(view, SEQUENCE_OFFSET)[0] == sequence:
+                if magic != MAGIC:
+                    return None
+                return {"version": version, "published_at": published_at,
+                        "heartbeat": heartbeat, "count": count}
+        return None
+
+    def is_current(self) -> bool:
+        """Whether a catalog is published and its leader is still alive"""
+        header = self.header()
+        return header is not None and time.time() - header["heartbeat"] < self.stale_after_seconds
+
+    def _write_header(self, version: int, published_at: float, count: int):
+        view = self._open()
+        sequence = SEQUENCE.unpack_from(view, SEQUENCE_OFFSET)[0]
+        SEQUENCE.pack_into(view, SEQUENCE_OFFSET, sequence + 1)
+        view[:len(MAGIC)] = MAGIC
+        BODY.pack_into(view, BODY_OFFSET, version, published_at, time.time(), count)
+        SEQUENCE.pack_into(view, SEQUENCE_OFFSET, sequence + 2)
+
+    def publish(self, documents: list) -> int:
+        """Write a new catalog version (leader only) and return its number"""
+        header = self.header()
+        version = (header["version"] if header else 0) + 1
+        data_path = f"{self.path}.{version}"
+        temporary = data_path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(orjson.dumps(documents, default=encode_value))
+        os.replace(temporary, data_path)
+        self._write_header(version, time.time(), len(documents))
+
+        # Keep the previous version for readers still opening it
+        for path in glob.glob(f"{glob.escape(self.path)}.*"):
+            suffix = path[len(self.path) + 1:]
+            if suffix.isdigit() and int(suffix) < version - 1:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return version
+
+    def heartbeat(self):
+        """Mark the published catalog as still maintained (leader only)"""
+        header = self.header()
+        if header is not None:
+            self._write_header(header["version"], header["published_at"], header["count"])
+
+    def read(self):
+        """(documents, version) of the published catalog, or None if there is none"""
+        header = self.header()
+        if header is None:
+            return None
+        try:
+            with open(f"{self.path}.{header['version']}", "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    # Parsed from the shared pages without copying them first
+                    with memoryview(data) as view:
+                        documents = orjson.loads(view)
+        except (FileNotFoundError, ValueError):
+            # Superseded while opening it; the next check picks up the new one
+            return None
+        return [decode_document(document) for document in documents], header["version"]
+
+    def request_refresh(self):
+        """Ask the leader to reload, e.g. after this worker wrote to Firestore"""
+        view = self._open()
+        requests = SEQUENCE.unpack_from(view, REQUESTS_OFFSET)[0]
+        SEQUENCE.pack_into(view, REQUESTS_OFFSET, requests + 1)
+
+    def refresh_requests(self) -> int:
+        return SEQUENCE.unpack_from(self._open(), REQUESTS_OFFSET)[0]
+
+    def close(self):
+        """Give up leadership so another worker takes over"""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.is_leader = False
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical reads. The first caller for a key runs
+    the fetch; callers arriving while it is in flight await the same
+    result instead of issuing their own Firestore query. Nothing is kept
+    once the fetch completes, so this never serves stale data.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._counters = {}
+
+    async def do(self, key: tuple, fetch):
+        """
+        Await `fetch()` once per in-flight `key`. The key's first element
+        names the operation for stats; the rest should be the normalised
+        parameters. The shared result must not be mutated by callers.
+        """
+        counters = self._counters.setdefault(key[0], {"calls": 0, "coalesced": 0})
+        counters["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            counters["coalesced"] += 1
+        else:
+            # A task of its own, so a caller that disconnects does not
+            # cancel the fetch for everyone waiting on it
+            task = asyncio.get_running_loop().create_task(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda finished: self._finish(key, finished))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: tuple, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here too, in case every waiter has gone away
+            logger.debug(f"Coalesced fetch {key[0]} failed: {task.exception()}")
+
+    def stats(self) -> dict:
+        """Calls and coalesced calls per operation"""
+        return {
+            "in_flight": len(self._in_flight),
+            "operations": {name: dict(counters) for name, counters in self._counters.items()},
+            "coalesced": sum(counters["coalesced"] for counters in self._counters.values()),
+        }
+
+single_flight = SingleFlight()
@@ -0,0 +1,272 @@
+from app.services.storage_backend import LocalStorage, matches, project, new_document_id
+from app.utils.json_documents import encode_value, decode_document
+from contextlib import contextmanager
+from datetime import datetime
+import threading
+import sqlite3
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields copied into their own columns so filters and ordering use real indexes
+INDEXED_FIELDS = ("category", "is_active", "is_featured", "created_at", "updated_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data BLOB NOT NULL,
+    category TEXT,
+    is_active INTEGER,
+    is_featured INTEGER,
+    created_at REAL,
+    updated_at REAL,
+    PRIMARY KEY (collection, id)
+) WITHOUT ROWID;
+-- Mirrors the composite indexes in firestore.indexes.json. Scanned
+-- backwards for newest-first pages; the implicit trailing id breaks ties.
+CREATE INDEX IF NOT EXISTS documents_active
+    ON documents (collection, is_active, created_at);
+CREATE INDEX IF NOT EXISTS documents_active_category
+    ON documents (collection, is_active, category, created_at);
+CREATE INDEX IF NOT EXISTS documents_active_featured
+    ON documents (collection, is_active, is_featured, created_at);
+CREATE INDEX IF NOT EXISTS documents_active_category_featured
+    ON documents (collection, is_active, category, is_featured, created_at);
+CREATE INDEX IF NOT EXISTS documents_created
+    ON documents (collection, created_at);
+"""
+
+SQL_OPERATORS = {"==": "=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+def _column_value(value):
+    """How a field value is stored in its index column"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+class SQLiteStorage(LocalStorage):
+    """
+    Storage backend keeping documents as JSON in a local SQLite file, with
+    the fields the product list filters and sorts on held in indexed
+    columns. Filters on other fields are applied in Python.
+    """
+
+    def __init__(self, path: str = "boltfit.db"):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def initialize(self):
+        self._connection()
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _row(collection_name: str, doc_id: str, data: dict) -> tuple:
+        return (
+            collection_name, doc_id, orjson.dumps(data, default=encode_value),
+            *(_column_value(data.get(field)) for field in INDEXED_FIELDS)
+        )
+
+    def _write(self, connection, collection_name: str, doc_id: str, data: dict):
+        connection.execute(
+            f"INSERT OR REPLACE INTO documents (collection, id, data, {', '.join(INDEXED_FIELDS)}) "
+            f"VALUES ({', '.join('?' * (3 + len(INDEXED_FIELDS)))})",
+            self._row(collection_name, doc_id, data)
+        )
+
+    @staticmethod
+    def _document(doc_id: str, data: bytes) -> dict:
+        return {"id": doc_id, **decode_document(orjson.loads(data))}
+
+    def _read(self, connection, collection_name: str, doc_id: str):
+        row = connection.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection_name, doc_id)
+        ).fetchone()
+        return decode_document(orjson.loads(row[0])) if row else None
+
+    def create_document(self, collection_name: str, data: dict) -> dict:
+        doc_id = new_document_id()
+        with self._transaction() as connection:
+            self._write(connection, collection_name, doc_id, data)
+        document = {"id": doc_id, **data}
+        self.notify(collection_name, [("added", doc_id, document)])
+        return document
+
+    def get_documents(self, collection_name: str, doc_ids: list) -> dict:
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if not doc_ids:
+            return {}
+        rows = self._connection().execute(
+            f"SELECT id, data FROM documents WHERE collection = ? AND id IN ({', '.join('?' * len(doc_ids))})",
+            (collection_name, *doc_ids)
+        ).fetchall()
+        return {doc_id: self._document(doc_id, data) for doc_id, data in rows}
+
+    def _where(self, collection_name: str, filters: list = None):
+        """Split filters into an SQL WHERE clause over indexed columns and the rest"""
+        clauses, params, remaining = ["collection = ?"], [collection_name], []
+        for field, op, value in filters or []:
+            if field in INDEXED_FIELDS and op in SQL_OPERATORS:
+                clauses.append(f"{field} {SQL_OPERATORS[op]} ?")
+                params.append(_column_value(value))
+            elif field in INDEXED_FIELDS and op in ("in", "not-in") and value:
+                negate = "NOT " if op == "not-in" else ""
+                clauses.append(f"{field} {negate}IN ({', '.join('?' * len(value))})")
+                params.extend(_column_value(item) for item in value)
+            else:
+                remaining.append((field, op, value))
+        return clauses, params, remaining
+
+    def query_documents(self, collection_name: str, filters: list = None, order_by: str = None,
+                        descending: bool = False, limit: int = None, offset: int = None,
+                        start_after: str = None, select: list = None) -> list:
+        connection = self._connection()
+        clauses, params, remaining = self._where(collection_name, filters)
+        direction = "DESC" if descending else "ASC"
+        sql_order = order_by is None or order_by in INDEXED_FIELDS
+
+        if order_by and sql_order:
+            clauses.append(f"{order_by} IS NOT NULL")
+            order = f"ORDER BY {order_by} {direction}, id {direction}"
+        else:
+            order = "ORDER BY id"
+
+        # Pagination can only be pushed down when SQLite sees every filter
+        pushdown = sql_order and not remaining
+        positioned = False
+        if start_after and pushdown:
+            if order_by:
+                cursor = connection.execute(
+                    f"SELECT {order_by} FROM documents WHERE collection = ? AND id = ?",
+                    (collection_name, start_after)
+                ).fetchone()
+                if cursor is not None:
+                    comparison = "<" if descending else ">"
+                    clauses.append(f"({order_by}, id) {comparison} (?, ?)")
+                    params.extend([cursor[0], start_after])
+                    positioned = True
+            else:
+                # IDs order the same whether or not the cursor still exists
+                clauses.append("id > ?")
+                params.append(start_after)
+                positioned = True
+        sql = f"SELECT id, data FROM documents WHERE {' AND '.join(clauses)} {order}"
+        if pushdown and (limit or offset):
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit or -1, 0 if positioned else offset or 0])
+
+        documents = [self._document(doc_id, data) for doc_id, data in connection.execute(sql, params)]
+        if not pushdown:
+            documents = [document for document in documents if matches(document, remaining)]
+            if order_by and not sql_order:
+                documents = [document for document in documents if document.get(order_by) is not None]
+                documents.sort(key=lambda document: (document[order_by], document["id"]), reverse=descending)
+            # A cursor that is gone (deleted, or no longer matching) falls back to the offset
+            start = offset or 0
+            if start_after:
+                for position, document in enumerate(documents):
+                    if document["id"] == start_after:
+                        start = position + 1
+                        break
+            documents = documents[start:start + limit if limit else None]
+        return [project(document, select) for document in documents]
+
+    def count_documents(self, collection_name: str, filters: list = None) -> int:
+        clauses, params, remaining = self._where(collection_name, filters)
+        if remaining:
+            return len(self.query_documents(collection_name, filters=filters))
+        return self._connection().execute(
+            f"SELECT COUNT(*) FROM documents WHERE {' AND '.join(clauses)}", params
+        ).fetchone()[0]
+
+    def patch_document(self, collection_name: str, doc_id: str, data: dict, base: dict = None):
+        with self._transaction() as connection:
+            current = self._read(connection, collection_name, doc_id)
+            if current is None:
+                return None
+            current.update(data)
+            self._write(connection, collection_name, doc_id, current)
+        document = {"id": doc_id, **current}
+        self.notify(collection_name, [("modified", doc_id, document)])
+        return document
+
+    def delete_document(self, collection_name: str, doc_id: str, must_exist: bool = False):
+        with self._transaction() as connection:
+            deleted = connection.execute(
+                "DELETE FROM documents WHERE collection = ? AND id = ?", (collection_name, doc_id)
+            ).rowcount > 0
+        if deleted:
+            self.notify(collection_name, [("removed", doc_id, None)])
+        return deleted or not must_exist
+
+    def bulk_write(self, collection_name: str, operations: list) -> list:
+        results = []
+        events = []
+        with self._transaction() as connection:
+            for op, doc_id, data in operations:
+                if op == "create":
+                    doc_id = new_document_id()
+                    self._write(connection, collection_name, doc_id, data)
+                    document = {"id": doc_id, **data}
+                    results.append({"id": doc_id, "status": "created", "document": document})
+                    events.append(("added", doc_id, document))
+                    continue
+                current = self._read(connection, collection_name, doc_id)
+                if current is None:
+                    results.append({"id": doc_id, "status": "failed", "error": "Document not found"})
+                    continue
+                current.update(data)
+                self._write(connection, collection_name, doc_id, current)
+                document = {"id": doc_id, **current}
+                results.append({"id": doc_id, "status": "updated", "document": document})
+                events.append(("modified", doc_id, document))
+        self.notify(collection_name, events)
+        return results
+
+    def run_transaction(self, refs: list, update):
+        # BEGIN IMMEDIATE takes the write lock up front, so reads cannot go stale
+        with self._transaction() as connection:
+            documents = {
+                (collection_name, doc_id): self._read(connection, collection_name, doc_id)
+                for collection_name, doc_id in refs
+            }
+            writes, result = update(documents)
+            for (collection_name, doc_id), data in writes.items():
+                if data is None:
+                    connection.execute(
+                        "DELETE FROM documents WHERE collection = ? AND id = ?", (collection_name, doc_id)
+                    )
+                else:
+                    self._write(connection, collection_name, doc_id, data)
+        self._notify_writes(documents, writes)
+        return result
@@ -0,0 +1,24 @@
+from app.config import settings
+from app.services.storage_backend import StorageBackend, AsyncStorage
+
+STORAGE_BACKENDS = ("firestore", "memory", "sqlite")
+
+def create_backend(name: str) -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND"""
+    # Backends are imported on demand so only the selected one is loaded
+    if name == "firestore":
+        from app.services.firebase_service import FirebaseService
+        return FirebaseService()
+    if name == "memory":
+        from app.services.memory_storage import MemoryStorage
+        return MemoryStorage()
+    if name == "sqlite":
+        from app.services.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(settings.SQLITE_DATABASE_PATH)
+    raise ValueError(f"Unknown storage backend {name!r}; expected one of {', '.join(STORAGE_BACKENDS)}")
+
+storage = AsyncStorage(create_backend(settings.STORAGE_BACKEND), settings.FIRESTORE_MAX_WORKERS)
+
+def get_storage() -> AsyncStorage:
+    """FastAPI dependency for the storage routes read and write through"""
+    return storage
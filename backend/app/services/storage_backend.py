@@ -0,0 +1,315 @@
+from app.utils.metrics import request_metrics
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+import operator
+import asyncio
+import time
+import secrets
+import string
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StorageBackend(ABC):
+    """
+    Document store the API runs on. Documents are dicts carrying their
+    "id"; filters are (field, op, value) tuples with Firestore semantics.
+    Firestore is the production backend; the in-memory and SQLite ones
+    run the whole API offline for local development and load testing.
+    """
+
+    # Whether calls block on network or disk and belong on the thread pool
+    blocking = True
+    init_error = None
+
+    def initialize(self):
+        """Connect eagerly (warm-up); backends otherwise connect on first use"""
+
+    @property
+    def is_initialized(self) -> bool:
+        return True
+
+    @abstractmethod
+    def create_document(self, collection_name: str, data: dict) -> dict:
+        """Add a document and return it as stored"""
+
+    @abstractmethod
+    def get_documents(self, collection_name: str, doc_ids: list) -> dict:
+        """Get several documents by ID as {id: document}. Missing IDs are left out"""
+
+    @abstractmethod
+    def query_documents(self, collection_name: str, filters: list = None, order_by: str = None,
+                        descending: bool = False, limit: int = None, offset: int = None,
+                        start_after: str = None, select: list = None) -> list:
+        """
+        Filter, order and paginate a collection. `start_after` is a document
+        ID; when that document no longer exists, `offset` is used instead
+        """
+
+    @abstractmethod
+    def count_documents(self, collection_name: str, filters: list = None) -> int:
+        """Count matching documents"""
+
+    @abstractmethod
+    def patch_document(self, collection_name: str, doc_id: str, data: dict, base: dict = None):
+        """Update a document and return its final state, or None if it does not exist"""
+
+    @abstractmethod
+    def delete_document(self, collection_name: str, doc_id: str, must_exist: bool = False):
+        """Delete a document. With `must_exist`, returns False if it was not there"""
+
+    @abstractmethod
+    def bulk_write(self, collection_name: str, operations: list) -> list:
+        """
+        Apply ("create", None, data) / ("update", doc_id, data) operations.
+        Returns one {"id", "status", "document"} or {"id", "status", "error"}
+        result per operation.
+        """
+
+    @abstractmethod
+    def run_transaction(self, refs: list, update):
+        """
+        Read the (collection, doc_id) `refs` and write back atomically.
+        `update` gets {ref: data or None} and returns (writes, result), where
+        writes maps refs to new data or None to delete; `result` is returned.
+        It may be called more than once if the transaction is retried, so it
+        must not have side effects. Exceptions it raises abort the transaction.
+        """
+
+    def add_document(self, collection_name: str, data: dict):
+        """Add a document and return its ID"""
+        return self.create_document(collection_name, data)["id"]
+
+    def get_document(self, collection_name: str, doc_id: str):
+        """Get a document by ID"""
+        return self.get_documents(collection_name, [doc_id]).get(doc_id)
+
+    def get_all_documents(self, collection_name: str):
+        """Get all documents from a collection"""
+        return self.query_documents(collection_name)
+
+    def stream_documents(self, collection_name: str, filters: list = None, order_by: str = None):
+        """Iterate over matching documents"""
+        yield from self.query_documents(collection_name, filters=filters, order_by=order_by)
+
+    def update_document(self, collection_name: str, doc_id: str, data: dict):
+        """Update a document"""
+        if self.patch_document(collection_name, doc_id, data) is None:
+            raise KeyError(f"Document not found: {doc_id}")
+        return True
+
+    def watch_collection(self, collection_name: str, on_changes):
+        """
+        Subscribe to changes of a collection. `on_changes` receives lists of
+        ("added" | "modified" | "removed", doc_id, document) events, starting
+        with every existing document as "added". Returns an object with
+        `unsubscribe()`.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support real-time listeners")
+
+# Filter operators, matching Firestore's where() semantics
+FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, options: value in options,
+    "not-in": lambda value, options: value not in options,
+    "array_contains": lambda value, item: isinstance(value, list) and item in value,
+    "array_contains_any": lambda value, items: isinstance(value, list) and any(item in value for item in items),
+}
+
+ID_ALPHABET = string.ascii_letters + string.digits
+
+def new_document_id() -> str:
+    """A random 20-character ID, like Firestore's auto IDs"""
+    return "".join(secrets.choice(ID_ALPHABET) for _ in range(20))
+
+def matches(document: dict, filters: list = None) -> bool:
+    """Whether a document passes (field, op, value) filters. Missing fields never match"""
+    for field, op, value in filters or []:
+        if field not in document or not FILTER_OPERATORS[op](document[field], value):
+            return False
+    return True
+
+def project(document: dict, select: list = None) -> dict:
+    """Keep only the selected fields (plus the ID) of a document"""
+    if not select:
+        return document
+    return {"id": document["id"], **{field: document[field] for field in select if field in document}}
+
+# Operations whose results are documents read from storage
+READ_OPERATIONS = {"get_document", "get_documents", "get_all_documents", "query_documents", "stream_documents"}
+
+def documents_read(operation: str, result) -> int:
+    """How many documents a storage call returned, for metrics"""
+    if operation not in READ_OPERATIONS or not result:
+        return 0
+    if operation == "get_document":
+        return 1
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 0
+
+class _Subscription:
+    def __init__(self, listeners: list, listener):
+        self._listeners = listeners
+        self._listener = listener
+        self.is_active = True
+
+    def unsubscribe(self):
+        if self.is_active:
+            self._listeners.remove(self._listener)
+            self.is_active = False
+
+class LocalStorage(StorageBackend):
+    """
+    Base for backends living inside this process. Every write goes through
+    it, so change listeners are simply called after each write.
+    """
+
+    def __init__(self):
+        self._listeners = {}
+        self._listeners_lock = threading.Lock()
+
+    def watch_collection(self, collection_name: str, on_changes):
+        with self._listeners_lock:
+            listeners = self._listeners.setdefault(collection_name, [])
+            listeners.append(on_changes)
+            subscription = _Subscription(listeners, on_changes)
+        on_changes([("added", document["id"], document) for document in self.get_all_documents(collection_name)])
+        return subscription
+
+    def notify(self, collection_name: str, events: list):
+        """Pass ("added" | "modified" | "removed", doc_id, document) events to listeners"""
+        if not events:
+            return
+        with self._listeners_lock:
+            listeners = list(self._listeners.get(collection_name, ()))
+        for listener in listeners:
+            try:
+                listener(events)
+            except Exception as e:
+                logger.error(f"Error applying {collection_name} changes: {e}")
+
+    def _notify_writes(self, documents: dict, writes: dict):
+        """Notify listeners of the writes of a transaction, per collection"""
+        events = {}
+        for (collection_name, doc_id), data in writes.items():
+            if data is None:
+                event = ("removed", doc_id, None)
+            else:
+                change = "modified" if documents.get((collection_name, doc_id)) is not None else "added"
+                event = (change, doc_id, {"id": doc_id, **data})
+            events.setdefault(collection_name, []).append(event)
+        for collection_name, collection_events in events.items():
+            self.notify(collection_name, collection_events)
+
+class AsyncStorage:
+    """
+    Awaitable facade over a StorageBackend. Blocking backends (the
+    Firestore client is synchronous) run every call on a bounded thread
+    pool instead of blocking the event loop that all other requests
+    share; in-memory backends are called directly.
+    """
+
+    def __init__(self, service: StorageBackend, max_workers: int = 8):
+        self.service = service
+        self._executor = None
+        if service.blocking:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+
+    async def warm_up(self):
+        """Import the client libraries and connect off the event loop"""
+        await self.run(self.service.initialize)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable on the storage thread pool"""
+        if self._executor is None:
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _call(self, operation: str, func, *args, **kwargs):
+        """Run a storage call, recording its duration and documents read as a span"""
+        started = time.perf_counter()
+        result = await self.run(func, *args, **kwargs)
+        request_metrics.record_span(
+            "storage", operation, time.perf_counter() - started, documents_read(operation, result)
+        )
+        return result
+
+    async def add_document(self, collection_name: str, data: dict):
+        return await self._call("add_document", self.service.add_document, collection_name, data)
+
+    async def create_document(self, collection_name: str, data: dict) -> dict:
+        return await self._call("create_document", self.service.create_document, collection_name, data)
+
+    async def get_document(self, collection_name: str, doc_id: str):
+        return await self._call("get_document", self.service.get_document, collection_name, doc_id)
+
+    async def get_documents(self, collection_name: str, doc_ids: list) -> dict:
+        return await self._call("get_documents", self.service.get_documents, collection_name, doc_ids)
+
+    async def get_all_documents(self, collection_name: str):
+        return await self._call("get_all_documents", self.service.get_all_documents, collection_name)
+
+    async def query_documents(self, collection_name: str, **kwargs):
+        return await self._call("query_documents", self.service.query_documents, collection_name, **kwargs)
+
+    def watch_collection(self, collection_name: str, on_changes):
+        # Registration is cheap and Firestore callbacks arrive on its own thread
+        return self.service.watch_collection(collection_name, on_changes)
+
+    async def count_documents(self, collection_name: str, filters: list = None) -> int:
+        return await self._call("count_documents", self.service.count_documents, collection_name, filters)
+
+    async def stream_documents(self, collection_name: str, filters: list = None, order_by: str = None,
+                               chunk_size: int = 100):
+        """Async iterator over matching documents, pulled from the backend in chunks"""
+        iterator = self.service.stream_documents(collection_name, filters, order_by)
+        exhausted = object()
+
+        def next_chunk():
+            chunk = []
+            for document in iterator:
+                chunk.append(document)
+                if len(chunk) >= chunk_size:
+                    break
+            return chunk or exhausted
+
+        try:
+            while True:
+                chunk = await self._call("stream_documents", next_chunk)
+                if chunk is exhausted:
+                    return
+                for document in chunk:
+                    yield document
+        finally:
+            # Ends the backend's stream (the Firestore RPC) when the consumer stops early
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    # Cancelled while a chunk was being read; the worker thread finishes it
+                    pass
+
+    async def update_document(self, collection_name: str, doc_id: str, data: dict):
+        return await self._call("update_document", self.service.update_document, collection_name, doc_id, data)
+
+    async def patch_document(self, collection_name: str, doc_id: str, data: dict, base: dict = None):
+        return await self._call("patch_document", self.service.patch_document, collection_name, doc_id, data, base)
+
+    async def bulk_write(self, collection_name: str, operations: list) -> list:
+        return await self._call("bulk_write", self.service.bulk_write, collection_name, operations)
+
+    async def delete_document(self, collection_name: str, doc_id: str, must_exist: bool = False):
+        return await self._call("delete_document", self.service.delete_document, collection_name, doc_id, must_exist)
+
+    async def run_transaction(self, refs: list, update):
+        return await self._call("run_transaction", self.service.run_transaction, refs, update)
@@ -0,0 +1,70 @@
+from fastapi import Request, Response
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+import hashlib
+import orjson
+
+def _etag_value(value):
+    # The same instant hashes the same whether it came back naive or tz-aware
+    if isinstance(value, datetime):
+        return _as_utc(value).isoformat()
+    return repr(value)
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the values that determine a response body"""
+    encoded = orjson.dumps(parts, default=_etag_value, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    digest = hashlib.sha1(encoded).hexdigest()
+    return f'"{digest}"'
+
+def weak_etag(etag: str) -> str:
+    """
+    Weak form of an ETag, for bodies sent in several content encodings:
+    the gzip, brotli and identity bytes differ, so one strong tag cannot
+    name them all
+    """
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already names this representation"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+def not_modified_since(request: Request, last_modified: datetime) -> bool:
+    """If-Modified-Since check, only consulted when no If-None-Match is sent"""
+    if last_modified is None or request.headers.get("if-none-match"):
+        return False
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+def _as_utc(value: datetime) -> datetime:
+    # Stored timestamps are written as naive UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def cache_headers(etag: str, cache_control: str, last_modified: datetime = None) -> dict:
+    """Validator and freshness headers for a cacheable response"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if isinstance(last_modified, datetime):
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    """Whether the client's cached copy is still current (RFC 9110 precedence)"""
+    return etag_matches(request, etag) or not_modified_since(request, last_modified)
+
+def not_modified_response(headers: dict) -> Response:
+    """Empty 304 reply carrying the same validators as a full response"""
+    return Response(status_code=304, headers=headers)
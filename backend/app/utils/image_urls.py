@@ -0,0 +1,21 @@
+from app.config import settings
+from urllib.parse import quote
+
+# Named image sizes served by the image proxy: the longest side, in pixels
+IMAGE_VARIANTS = {
+    "thumb": 160,
+    "card": 480,
+    "detail": 1200,
+}
+
+def variant_urls(url: str) -> dict:
+    """Image proxy URL of every variant of one original image"""
+    encoded = quote(url, safe="")
+    return {
+        variant: f"{settings.IMAGE_PROXY_BASE_URL}/api/v1/images/{variant}?url={encoded}"
+        for variant in IMAGE_VARIANTS
+    }
+
+def image_variants(images: list) -> list:
+    """Per-variant URLs for each of a product's images, in the same order"""
+    return [variant_urls(url) for url in images or []]
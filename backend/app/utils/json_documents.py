@@ -0,0 +1,21 @@
+from datetime import datetime
+
+# Timestamp fields turned back into datetimes when documents are read from JSON
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+def encode_value(value):
+    """orjson `default` for values it cannot serialize natively"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__} as JSON")
+
+def decode_document(document: dict) -> dict:
+    """Restore the datetime fields of a document loaded from JSON"""
+    for field in DATETIME_FIELDS:
+        value = document.get(field)
+        if isinstance(value, str):
+            try:
+                document[field] = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    return document
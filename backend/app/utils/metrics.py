@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from bisect import bisect_left
+import threading
+import time
+
+# Seconds; the latency buckets Prometheus client libraries default to
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+DOCUMENT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+# Spans of the request being handled, for its Server-Timing header
+_request_spans = ContextVar("request_spans", default=None)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in Prometheus style"""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = _labels(self.label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+
+    def inc(self, amount: float = 1, *labels):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+class Gauge(Counter):
+    """Value that goes up and down per label set"""
+
+    metric_type = "gauge"
+
+    def dec(self, amount: float = 1, *labels):
+        self.inc(-amount, *labels)
+
+class RequestMetrics:
+    """
+    Process-wide request and span metrics, rendered in the Prometheus text
+    format. Spans (storage calls, token verification, serialization) are
+    also collected per request for the Server-Timing header.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Histogram(
+            "http_request_duration_seconds", "Time to handle a request",
+            ("method", "route", "status"))
+        self.response_sizes = Histogram(
+            "http_response_size_bytes", "Response body size as sent",
+            ("method", "route"), SIZE_BUCKETS)
+        self.in_flight = Gauge("http_requests_in_flight", "Requests currently being handled")
+        self.request_documents = Histogram(
+            "http_request_documents_read", "Documents read from storage per request",
+            ("method", "route"), DOCUMENT_BUCKETS)
+        self.spans = Histogram(
+            "span_duration_seconds", "Time spent in instrumented operations",
+            ("span", "operation"))
+        self.documents_read = Counter(
+            "storage_documents_read_total", "Documents read from storage",
+            ("operation",))
+
+    def start_request(self) -> dict:
+        """Begin collecting spans for the current request"""
+        spans = {}
+        _request_spans.set(spans)
+        with self._lock:
+            self.in_flight.inc(1)
+        return spans
+
+    def finish_request(self, method: str, route: str, status: int, duration: float, size: int, spans: dict):
+        documents = spans.get("storage", {}).get("documents", 0)
+        with self._lock:
+            self.in_flight.dec(1)
+            self.requests.observe(duration, method, route, str(status))
+            self.response_sizes.observe(size, method, route)
+            self.request_documents.observe(documents, method, route)
+
+    def record_span(self, span: str, operation: str, duration: float, documents: int = 0):
+        """Record one instrumented call, globally and for the current request"""
+        with self._lock:
+            self.spans.observe(duration, span, operation)
+            if documents:
+                self.documents_read.inc(documents, operation)
+        spans = _request_spans.get()
+        if spans is not None:
+            entry = spans.setdefault(span, {"calls": 0, "duration": 0.0, "documents": 0})
+            entry["calls"] += 1
+            entry["duration"] += duration
+            entry["documents"] += documents
+
+    @contextmanager
+    def span(self, span: str, operation: str = ""):
+        """Time the enclosed block as one call of `span`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(span, operation, time.perf_counter() - started)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.response_sizes, self.in_flight, self.request_documents,
+                           self.spans, self.documents_read):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,313 @@
+"""
+Benchmark and load test for the product API.
+
+Runs the FastAPI app in-process against the in-memory (or SQLite) storage
+backend, seeds generated catalogs of several sizes and measures latency
+percentiles and throughput for the list, filter, search, paginate, detail
+and admin write paths at several concurrency levels. No Firebase project
+or network access is needed.
+
+Run from the backend directory:
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --sizes 100,1000,10000,100000 --concurrency 1,16,64
+    python -m benchmarks.run_benchmarks --backend sqlite --no-cache --output results.json
+
+Results are printed as a table and written as JSON for comparing runs.
+"""
+import argparse
+import os
+import sys
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the BOLT FIT product API")
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="Comma-separated catalog sizes to seed (default: 100,1000,10000)")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="Comma-separated numbers of concurrent clients (default: 1,8,32)")
+    parser.add_argument("--requests", type=int, default=500,
+                        help="Requests per scenario and concurrency level (default: 500)")
+    parser.add_argument("--scenarios", default=None,
+                        help="Comma-separated subset of scenarios to run (default: all)")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory",
+                        help="Storage backend to run against (default: memory)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the catalog cache so every read reaches storage")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for catalogs and requests")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="Where to write the JSON results (default: benchmark_results.json)")
+    return parser.parse_args(argv)
+
+# The app reads its settings at import time, so configure it before importing
+ARGS = parse_args() if __name__ == "__main__" else None
+if ARGS is not None:
+    os.environ["STORAGE_BACKEND"] = ARGS.backend
+    os.environ["CATALOG_CACHE_ENABLED"] = "false" if ARGS.no_cache else "true"
+    os.environ["CATALOG_SNAPSHOT_PATH"] = ""
+    os.environ["CATALOG_REALTIME_SYNC"] = "false"
+    os.environ["DEBUG"] = "false"
+
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+import statistics
+import platform
+import tempfile
+import logging
+import asyncio
+import random
+import json
+import time
+
+from app.main import app
+from app.config import settings
+from app.auth.google_auth import get_current_admin
+from app.services.storage import storage, create_backend
+from app.services.catalog_cache import catalog_cache
+from app.services.product_serializer import product_serializer
+from app.routes.products import PRODUCT_CATEGORIES
+
+BENCHMARK_ADMIN = {"email": "benchmark@example.com", "name": "Benchmark", "is_admin": True, "verified": True}
+
+WORDS = ["cotton", "linen", "slim", "regular", "oversized", "classic", "stretch", "denim", "cargo",
+         "polo", "oxford", "graphic", "striped", "checked", "plain", "premium", "summer", "casual"]
+COLORS = [("Navy", "#000080"), ("Black", "#000000"), ("White", "#FFFFFF"), ("Olive", "#808000"),
+          ("Maroon", "#800000"), ("Grey", "#808080")]
+SEARCH_TERMS = ["cotton", "slim shirt", "denim", "classic polo", "str", "navy", "linen pants", "gra"]
+
+def generate_product(rng: random.Random, index: int, started: datetime) -> dict:
+    category = rng.choice(PRODUCT_CATEGORIES)
+    words = rng.sample(WORDS, 3)
+    price = round(rng.uniform(299, 2999), 2)
+    created_at = started + timedelta(minutes=index)
+    return {
+        "name": f"{words[0].title()} {words[1].title()} {category.rstrip('s')} {index}",
+        "description": f"{' '.join(rng.sample(WORDS, 6))} menswear, item {index}",
+        "price": price,
+        "original_price": round(price * 1.25, 2) if rng.random() < 0.4 else None,
+        "category": category,
+        "images": [f"https://i.ibb.co/bench/{index}-{n}.jpg" for n in range(rng.randint(1, 4))],
+        "sizes": [{"size": size, "stock": rng.randint(0, 25)} for size in ("S", "M", "L", "XL")],
+        "colors": [{"name": name, "hex_code": hex_code} for name, hex_code in rng.sample(COLORS, 2)],
+        "material": rng.choice(["Cotton", "Linen", "Denim", "Polyester"]),
+        "brand": "BOLT FIT",
+        "is_featured": rng.random() < 0.1,
+        "is_active": rng.random() < 0.9,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "created_by": BENCHMARK_ADMIN["email"],
+    }
+
+def reset_storage(backend: str, size: int, rng: random.Random) -> list:
+    """Swap in an empty backend, seed it with `size` products and return their IDs"""
+    if backend == "sqlite":
+        settings.SQLITE_DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="boltfit-bench-"), "bench.db")
+    storage.service = create_backend(backend)
+    catalog_cache.invalidate()
+    product_serializer.clear()
+
+    started = datetime(2024, 1, 1)
+    ids = []
+    for chunk_start in range(0, size, 500):
+        operations = [
+            ("create", None, generate_product(rng, index, started))
+            for index in range(chunk_start, min(chunk_start + 500, size))
+        ]
+        ids.extend(result["id"] for result in storage.service.bulk_write("products", operations))
+    return ids
+
+async def asgi_request(method: str, path: str, query: dict = None, body: bytes = b"",
+                       content_type: str = None) -> tuple:
+    """Call the app directly over ASGI; returns (status, response bytes)"""
+    headers = [(b"host", b"benchmark"), (b"authorization", b"Bearer benchmark")]
+    if content_type:
+        headers.append((b"content-type", content_type.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(query or {}).encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    status = None
+    size = 0
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnected.set()
+    return status, size
+
+def build_scenarios(ids: list, rng: random.Random) -> dict:
+    """Each scenario returns the next request as (method, path, query, body, content_type)"""
+    products_path = "/api/v1/products/"
+    per_page = 20
+
+    def list_page():
+        return "GET", products_path, {"per_page": per_page}, b"", None
+
+    def filter_page():
+        query = {"per_page": per_page, "category": rng.choice(PRODUCT_CATEGORIES)}
+        if rng.random() < 0.5:
+            query["is_featured"] = "true"
+        return "GET", products_path, query, b"", None
+
+    def search():
+        return "GET", products_path, {"per_page": per_page, "search": rng.choice(SEARCH_TERMS)}, b"", None
+
+    def paginate():
+        pages = max(len(ids) // per_page, 1)
+        return "GET", products_path, {"per_page": per_page, "page": rng.randint(1, pages)}, b"", None
+
+    def card_view():
+        return "GET", products_path, {"per_page": 50, "view": "card"}, b"", None
+
+    def detail():
+        return "GET", f"{products_path}{rng.choice(ids)}", {}, b"", None
+
+    def write():
+        if rng.random() < 0.2:
+            form = {"name": f"Benchmark tee {rng.randint(0, 10 ** 6)}", "description": "Load test product",
+                    "price": "499", "category": rng.choice(PRODUCT_CATEGORIES), "sizes": "S,M,L",
+                    "colors": "Black", "image_urls": '["https://i.ibb.co/bench/new.jpg"]'}
+            return "POST", products_path, {}, urlencode(form).encode(), "application/x-www-form-urlencoded"
+        form = {"price": f"{rng.uniform(299, 2999):.2f}"}
+        return ("PUT", f"{products_path}{rng.choice(ids)}", {}, urlencode(form).encode(),
+                "application/x-www-form-urlencoded")
+
+    return {
+        "list": list_page,
+        "filter": filter_page,
+        "search": search,
+        "paginate": paginate,
+        "card_view": card_view,
+        "detail": detail,
+        "write": write,
+    }
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[position]
+
+async def run_scenario(next_request, total_requests: int, concurrency: int) -> dict:
+    """Fire `total_requests` requests from `concurrency` concurrent clients"""
+    latencies = []
+    errors = 0
+    response_bytes = 0
+    remaining = total_requests
+
+    async def client():
+        nonlocal remaining, errors, response_bytes
+        while remaining > 0:
+            remaining -= 1
+            method, path, query, body, content_type = next_request()
+            started = time.perf_counter()
+            status, size = await asgi_request(method, path, query, body, content_type)
+            latencies.append((time.perf_counter() - started) * 1000)
+            response_bytes += size
+            if status is None or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "mean_response_bytes": round(response_bytes / len(latencies)) if latencies else 0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p90": round(percentile(latencies, 0.90), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+async def benchmark(args) -> dict:
+    sizes = [int(size) for size in args.sizes.split(",")]
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    rng = random.Random(args.seed)
+    results = []
+
+    for size in sizes:
+        seed_started = time.perf_counter()
+        ids = reset_storage(args.backend, size, rng)
+        seed_seconds = time.perf_counter() - seed_started
+
+        # First request after seeding: pays for loading the catalog cache
+        started = time.perf_counter()
+        await asgi_request("GET", "/api/v1/products/", {"per_page": 20})
+        if catalog_cache.enabled:
+            await catalog_cache.get_all()
+        first_request_ms = (time.perf_counter() - started) * 1000
+        print(f"\nCatalog of {size} products: seeded in {seed_seconds:.2f}s, "
+              f"first list request {first_request_ms:.1f}ms")
+
+        scenarios = build_scenarios(ids, rng)
+        selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+        for name in selected:
+            for concurrency in concurrency_levels:
+                result = await run_scenario(scenarios[name], args.requests, concurrency)
+                result.update({"catalog_size": size, "scenario": name, "concurrency": concurrency,
+                               "first_request_ms": round(first_request_ms, 3)})
+                results.append(result)
+                latency = result["latency_ms"]
+                print(f"{name:>10} c={concurrency:<4} {result['throughput_rps']:>9} req/s  "
+                      f"p50 {latency['p50']:>8.2f}ms  p90 {latency['p90']:>8.2f}ms  "
+                      f"p99 {latency['p99']:>8.2f}ms  errors {result['errors']}")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "catalog_cache": not args.no_cache,
+            "requests_per_run": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+def main(args):
+    logging.disable(logging.INFO)
+    app.dependency_overrides[get_current_admin] = lambda: BENCHMARK_ADMIN
+    report = asyncio.run(benchmark(args))
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    sys.exit(main(ARGS))
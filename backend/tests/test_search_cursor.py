@@ -0,0 +1,65 @@
+import subprocess
+import json
+import sys
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGE_SCRIPT = """
+import json
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.storage import storage
+
+storage.service.bulk_write("products", [
+    ("create", None, {
+        "name": f"Cotton shirt {i}", "description": "Soft cotton", "price": 10.0 + i,
+        "category": "Shirts", "images": [], "sizes": [{"size": "M", "stock": 3}],
+        "colors": [], "material": "Cotton", "brand": "BOLT FIT",
+        "is_featured": False, "is_active": True,
+        "created_at": datetime(2024, 1, 1) + timedelta(hours=i),
+        "updated_at": datetime(2024, 1, 1) + timedelta(hours=i),
+    })
+    for i in range(7)
+])
+
+with TestClient(app) as client:
+    pages, cursor = [], None
+    while len(pages) < 10:
+        params = {"search": "shirt", "per_page": 3}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/v1/products/", params=params).json()
+        pages.append([product["id"] for product in body["products"]])
+        cursor = body.get("next_cursor")
+        if not cursor:
+            break
+print(json.dumps({"total": body["total"], "pages": pages}))
+"""
+
+def _page_search(cache_enabled: bool) -> dict:
+    """Follow next_cursor through a search in a fresh interpreter on in-memory storage"""
+    result = subprocess.run(
+        [sys.executable, "-c", PAGE_SCRIPT],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60,
+        env={
+            **os.environ, "PYTHONDONTWRITEBYTECODE": "1", "STORAGE_BACKEND": "memory",
+            "GOOGLE_CLIENT_ID": "test", "CATALOG_SNAPSHOT_PATH": "", "SHARED_CATALOG_PATH": "",
+            "CATALOG_CACHE_ENABLED": str(cache_enabled),
+        }
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def _assert_pages_cover_results(result: dict):
+    ids = [product_id for page in result["pages"] for product_id in page]
+    assert len(result["pages"]) <= 3, f"Cursor did not advance: {result['pages']}"
+    assert len(ids) == len(set(ids)) == result["total"] == 7
+
+def test_search_pages_by_cursor_from_cache():
+    _assert_pages_cover_results(_page_search(cache_enabled=True))
+
+def test_search_pages_by_cursor_without_cache():
+    _assert_pages_cover_results(_page_search(cache_enabled=False))
@@ -0,0 +1,46 @@
+import subprocess
+import json
+import sys
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Workers must pass liveness well under a second after starting. FastAPI
+# itself takes a fixed share of that; this budget is for the app's own imports
+IMPORT_BUDGET_SECONDS = 0.5
+
+IMPORT_SCRIPT = """
+import json
+import sys
+import time
+
+import fastapi
+
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+def _import_app() -> dict:
+    """Import app.main in a fresh interpreter, so nothing is already loaded"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_import_stays_within_budget():
+    # Best of three, so a busy machine does not fail the test
+    seconds = min(_import_app()["seconds"] for _ in range(3))
+    assert seconds < IMPORT_BUDGET_SECONDS, f"Importing app.main took {seconds:.2f}s"
+
+def test_import_does_not_load_firebase_or_google_auth():
+    loaded = [
+        name for name in _import_app()["modules"]
+        if name == "firebase_admin" or name.startswith("firebase_admin.")
+        or name == "google" or name.startswith("google.")
+    ]
+    assert loaded == [], f"Imported at startup: {', '.join(loaded)}"